@@ -4,6 +4,7 @@ Base class for classifiers
 import sys, os, copy, types, subprocess, atexit, shutil
 sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/..")
 import Utils.Parameters as Parameters
+import Core.ExampleUtils as ExampleUtils
 
 def removeTempUnzipped(filename):
     if os.path.exists(filename):
@@ -12,6 +13,8 @@ def removeTempUnzipped(filename):
             os.remove(filename)
 
 class Classifier:
+    binaryExamples = False # the classifier program can read the binary example format
+    
     # Public interface ##########################################################################
     def __init__(self, connection=None):
         pass
@@ -66,6 +69,23 @@ class Classifier:
             atexit.register(removeTempUnzipped, tempfilename) # mark for deletion
         return tempfilename
     
+    @classmethod
+    def getTextExamples(cls, filename):
+        """
+        Temporarily convert a binary example file into the SVM-light text format, for
+        classifier programs that cannot read the binary format. As with getUnzipped,
+        the converted file appears in the same location as the original file.
+        """
+        tempfilename = filename
+        if tempfilename.endswith(".gz"):
+            tempfilename = tempfilename[:-3]
+        tempfilename += "-text-temp"
+        if not os.path.exists(tempfilename) or os.path.getmtime(filename) > os.path.getmtime(tempfilename):
+            print >> sys.stderr, "Converting binary example file", filename, "to text"
+            ExampleUtils.writeExamples(ExampleUtils.readExamples(filename), tempfilename)
+            atexit.register(removeTempUnzipped, tempfilename) # mark for deletion
+        return tempfilename
+    
     @classmethod
     def getFileCounter(cls, filename, add=0, createIfNotExist=False, removeIfZero=False):
         """
@@ -103,6 +123,9 @@ class Classifier:
             #ExampleUtils.writeExamples(examples, trainPath + "/")
         else:
             examplesPath = os.path.normpath(os.path.abspath(examples))
+        if not self.binaryExamples and ExampleUtils.isBinaryExampleFile(examplesPath):
+            examplesPath = Classifier.getTextExamples(examplesPath)
+            Classifier.getFileCounter(examplesPath, 1, createIfNotExist=True)
        
         localPath = examplesPath
         if upload:
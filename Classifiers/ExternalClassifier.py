@@ -9,12 +9,27 @@ import tempfile
 import atexit
 import gzip
 import types, copy
+import time
+from multiprocessing import Pool, cpu_count
 from Classifier import Classifier
 import Utils.Parameters as Parameters
 import Utils.Settings as Settings
 import Utils.Connection.Connection as Connection
 from Utils.Connection.UnixConnection import UnixConnection
 
+def _evaluateCombination(evaluator, classifyExamples, predictions, classIds, outDir, id, determineThreshold):
+    """
+    Evaluate the predictions of one parameter combination. Used by ExternalClassifier.optimize
+    in its worker processes.
+    """
+    threshold = None
+    if determineThreshold:
+        evaluation = evaluator.evaluate(classifyExamples, predictions, classIds, os.path.join(outDir, "evaluation-before-threshold" + id + ".csv"), verbose=False)
+        threshold, bestF = evaluator.threshold(classifyExamples, predictions)
+        print >> sys.stderr, "Thresholding" + id + ", original micro =", evaluation.microF.toStringConcise(), "threshold =", threshold, "at binary fscore", str(bestF)[0:6]
+    evaluation = evaluator.evaluate(classifyExamples, ExampleUtils.loadPredictions(predictions, threshold=threshold), classIds, os.path.join(outDir, "evaluation" + id + ".csv"))
+    return evaluation, threshold
+
 class ExternalClassifier(Classifier):
     """
     A wrapper for external classifier executables.
@@ -188,53 +203,81 @@ class ExternalClassifier(Classifier):
             classifier.downloadPredictions()
         return classifier
     
-    def optimize(self, examples, outDir, parameters, classifyExamples, classIds, step="BOTH", evaluator=None, determineThreshold=False, timeout=None, downloadAllModels=False):
-        assert step in ["BOTH", "SUBMIT", "RESULTS"], step
-        outDir = os.path.abspath(outDir)
-        # Initialize training (or reconnect to existing jobs)
-        combinations = Parameters.getCombinations(Parameters.get(parameters, valueListKey="c")) #Core.OptimizeParameters.getParameterCombinations(parameters)
-        trained = []
-        for combination in combinations:
-            trained.append( self.train(examples, outDir, combination, classifyExamples, replaceRemoteExamples=(len(trained) == 0), dummy=(step == "RESULTS")) )
-        if step == "SUBMIT": # Return already
-            classifier = copy.copy(self)
-            classifier.setState("OPTIMIZE")
-            return classifier
-        
-        # Wait for the training to finish
-        finalJobStatus = self.connection.waitForJobs([x.getJob() for x in trained])
-        # Evaluate the results
-        print >> sys.stderr, "Evaluating results"
-        #Stream.setIndent(" ")
-        bestResult = None
-        if evaluator == None:
-            evaluator = self.defaultEvaluator
-        for i in range(len(combinations)):
+    def _evaluateFinished(self, trained, evaluations, jobStatus, pool, evaluationArgs, downloadAllModels):
+        """
+        Start the evaluation of the combinations whose training has finished since the
+        last call. Returns the number of combinations still training.
+        """
+        evaluator, classifyExamples, classIds, outDir, determineThreshold = evaluationArgs
+        numWaiting = 0
+        for i in range(len(trained)):
+            if i in evaluations:
+                continue
+            status = trained[i].getStatus()
+            if status in ["QUEUED", "RUNNING"]:
+                numWaiting += 1
+                continue
+            jobStatus[status] = jobStatus.get(status, 0) + 1
             id = trained[i].parameterIdStr
-            #Stream.setIndent(" ")
-            # Get predictions
-            predictions = None
-            if trained[i].getStatus() == "FINISHED":
-                predictions = trained[i].downloadPredictions()
-            else:
+            if status != "FINISHED":
                 print >> sys.stderr, "No results for combination" + id
+                evaluations[i] = None
                 continue
+            # Get predictions
+            predictions = trained[i].downloadPredictions()
             if downloadAllModels:
                 trained[i].downloadModel()
-            # Compare to other results
             print >> sys.stderr, "*** Evaluating results for combination" + id + " ***"
-            threshold = None
-            if determineThreshold:
-                print >> sys.stderr, "Thresholding, original micro =",
-                evaluation = evaluator.evaluate(classifyExamples, predictions, classIds, os.path.join(outDir, "evaluation-before-threshold" + id + ".csv"), verbose=False)
-                print >> sys.stderr, evaluation.microF.toStringConcise()
-                threshold, bestF = evaluator.threshold(classifyExamples, predictions)
-                print >> sys.stderr, "threshold =", threshold, "at binary fscore", str(bestF)[0:6]
-            evaluation = evaluator.evaluate(classifyExamples, ExampleUtils.loadPredictions(predictions, threshold=threshold), classIds, os.path.join(outDir, "evaluation" + id + ".csv"))
-            if bestResult == None or evaluation.compare(bestResult[0]) > 0: #: averageResult.fScore > bestResult[1].fScore:
-                bestResult = [evaluation, trained[i], combinations[i], threshold]
-            if not self.connection.isLocal():
-                os.remove(predictions) # remove predictions to save space
+            evaluations[i] = (pool.apply_async(_evaluateCombination, (evaluator, classifyExamples, predictions, classIds, outDir, id, determineThreshold)), predictions)
+        return numWaiting
+    
+    def optimize(self, examples, outDir, parameters, classifyExamples, classIds, step="BOTH", evaluator=None, determineThreshold=False, timeout=None, downloadAllModels=False, evaluationProcesses=None):
+        assert step in ["BOTH", "SUBMIT", "RESULTS"], step
+        outDir = os.path.abspath(outDir)
+        if evaluator == None:
+            evaluator = self.defaultEvaluator
+        # Initialize training (or reconnect to existing jobs)
+        combinations = Parameters.getCombinations(Parameters.get(parameters, valueListKey="c")) #Core.OptimizeParameters.getParameterCombinations(parameters)
+        trained = []
+        evaluations = {} # combination index : (asynchronous evaluation, predictions) or None if no results
+        finalJobStatus = {"FINISHED":0, "FAILED":0}
+        pool = None
+        if step != "SUBMIT": # finished combinations are evaluated in worker processes while the others are training
+            if evaluationProcesses == None:
+                evaluationProcesses = min(cpu_count(), len(combinations))
+            pool = Pool(max(1, evaluationProcesses))
+        try:
+            for combination in combinations:
+                trained.append( self.train(examples, outDir, combination, classifyExamples, replaceRemoteExamples=(len(trained) == 0), dummy=(step == "RESULTS")) )
+                if pool != None:
+                    self._evaluateFinished(trained, evaluations, finalJobStatus, pool, (evaluator, classifyExamples, classIds, outDir, determineThreshold), downloadAllModels)
+            if step == "SUBMIT": # Return already
+                classifier = copy.copy(self)
+                classifier.setState("OPTIMIZE")
+                return classifier
+            
+            # Wait for the training to finish
+            print >> sys.stderr, "Waiting for results"
+            pollIntervalSeconds = 1 if self.connection.isLocal() else 60
+            while self._evaluateFinished(trained, evaluations, finalJobStatus, pool, (evaluator, classifyExamples, classIds, outDir, determineThreshold), downloadAllModels) > 0:
+                time.sleep(pollIntervalSeconds)
+            # Compare the results in the order of the combinations
+            print >> sys.stderr, "Evaluating results"
+            #Stream.setIndent(" ")
+            bestResult = None
+            for i in range(len(combinations)):
+                if evaluations[i] == None:
+                    continue
+                result, predictions = evaluations[i]
+                evaluation, threshold = result.get()
+                if bestResult == None or evaluation.compare(bestResult[0]) > 0: #: averageResult.fScore > bestResult[1].fScore:
+                    bestResult = [evaluation, trained[i], combinations[i], threshold]
+                if not self.connection.isLocal():
+                    os.remove(predictions) # remove predictions to save space
+        finally:
+            if pool != None:
+                pool.terminate()
+                pool.join()
         #Stream.setIndent()
         if bestResult == None:
             raise Exception("No results for any parameter combination")
@@ -1,15 +1,60 @@
 import sys,os
 sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/..")
+import copy
+import atexit
+from multiprocessing import Process, Pipe
 from ExternalClassifier import ExternalClassifier
 import Utils.Connection.Connection as Connection
 import Utils.Parameters as Parameters
+import Utils.Settings as Settings
 from Evaluators.AveragingMultiClassEvaluator import AveragingMultiClassEvaluator
 
+# Worker processes keeping scikit-learn models loaded, by model path
+_persistentModels = {}
+
+def _serve(modelPath, connection):
+    import ScikitWrapper # scikit-learn is imported only in the worker process
+    ScikitWrapper.serve(modelPath, connection)
+
+def getPersistentModel(modelPath):
+    """
+    Returns the connection to a worker process that has the model loaded. A new worker 
+    is started if there is none yet for the model, or if the model file has changed.
+    """
+    mtime = os.path.getmtime(modelPath)
+    if modelPath in _persistentModels:
+        if _persistentModels[modelPath][0] == mtime and _persistentModels[modelPath][1].is_alive():
+            return _persistentModels[modelPath][2]
+        closePersistentModel(modelPath)
+    print >> sys.stderr, "Loading persistent scikit-learn model", modelPath
+    connection, workerConnection = Pipe()
+    process = Process(target=_serve, args=(modelPath, workerConnection))
+    process.daemon = True
+    process.start()
+    _persistentModels[modelPath] = (mtime, process, connection)
+    return connection
+
+def closePersistentModel(modelPath):
+    mtime, process, connection = _persistentModels.pop(modelPath)
+    if process.is_alive():
+        connection.send(None)
+        process.join()
+    connection.close()
+
+def closePersistentModels():
+    for modelPath in _persistentModels.keys():
+        closePersistentModel(modelPath)
+atexit.register(closePersistentModels)
+
 class ScikitClassifier(ExternalClassifier):
+    binaryExamples = True
     
-    def __init__(self, connection=None):
+    def __init__(self, connection=None, persistent=None):
         ExternalClassifier.__init__(self, connection=connection)
         self.defaultEvaluator = AveragingMultiClassEvaluator
+        if persistent == None:
+            persistent = Settings.SCIKIT_PERSISTENT
+        self.persistent = persistent # classify locally with models kept loaded in worker processes
         self.parameterFormat = "-%k %v"
         self.parameterValueListKey["train"] = "c"
         self.parameterValueTypes["train"] = {"c":[int,float]}
@@ -19,6 +64,32 @@ class ScikitClassifier(ExternalClassifier):
         #self.classifyDirSetting = "SCIKIT_WRAPPER_DIR"
         self.classifyCommand = "python " + wrapperPath + " --classify --examples %e --model %m --predictions %c"
     
+    def classify(self, examples, output, model=None, finishBeforeReturn=False, replaceRemoteFiles=True):
+        if not (self.persistent and self.connection.isLocal()):
+            return ExternalClassifier.classify(self, examples, output, model, finishBeforeReturn, replaceRemoteFiles)
+        output = os.path.abspath(output)
+        # Return a new classifier instance for using the predictions
+        classifier = copy.copy(self)
+        classifier.setState("CLASSIFY")
+        if model == None:
+            classifier.model = model = self.model
+        model = os.path.abspath(model)
+        examples = self.getExampleFile(examples, replaceRemote=replaceRemoteFiles)
+        print >> sys.stderr, "Classifying", examples, "with persistent model", model
+        connection = getPersistentModel(model)
+        try:
+            connection.send((examples, output))
+            error = connection.recv()
+        except EOFError:
+            error = "worker process exited"
+        finally:
+            ExternalClassifier.getFileCounter(examples, add=-1, createIfNotExist=False)
+        if error != None:
+            closePersistentModel(model)
+            raise Exception("Persistent classification with model " + model + " failed: " + error)
+        classifier.predictions = output
+        return classifier
+    
 if __name__=="__main__":
     from optparse import OptionParser
     optparser = OptionParser(description="Joachims SVM Multiclass classifier wrapper")
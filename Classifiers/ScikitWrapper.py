@@ -25,6 +25,36 @@ def loadClf(filename):
     f.close()
     return clf
 
+def loadExamples(filename, featureCount=None):
+    """
+    Load an example file as a sparse matrix. The SVM-light text format is read with
+    scikit-learn, the TEES binary example format with Core.ExampleUtils. If featureCount
+    is set, features with higher ids (e.g. hashed ids not seen in training) are ignored.
+    """
+    import Core.ExampleUtils as ExampleUtils
+    import numpy
+    from scipy.sparse import csr_matrix
+    if not ExampleUtils.isBinaryExampleFile(filename):
+        if featureCount != None:
+            X, y = load_svmlight_file(filename)
+            if X.shape[1] > featureCount:
+                X = X[:, :featureCount]
+            return csr_matrix((X.data, X.indices, X.indptr), shape=(X.shape[0], featureCount)), y
+        return load_svmlight_file(filename)
+    data, indices, indptr, y = [], [], [0], []
+    for example in ExampleUtils.readExamples(filename):
+        keys = sorted(example[2].keys())
+        if featureCount != None:
+            keys = [x for x in keys if x <= featureCount]
+        indices.extend([x - 1 for x in keys]) # feature ids are one-based
+        data.extend([example[2][x] for x in keys])
+        indptr.append(len(indices))
+        y.append(example[1])
+    if featureCount == None:
+        featureCount = max(indices) + 1 if len(indices) > 0 else 0
+    X = csr_matrix((numpy.array(data, dtype=numpy.float64), numpy.array(indices, dtype=numpy.int32), numpy.array(indptr, dtype=numpy.int32)), shape=(len(y), featureCount))
+    return X, numpy.array(y, dtype=numpy.float64)
+
 def train():
     params, files = getParameters(["examples", "model"])
     clfName = params["scikit"]
@@ -35,7 +65,7 @@ def train():
     #print params, files
     clfClass = getClassifier(clfName, params)
     clf = clfClass(**params)
-    X_train, y_train = load_svmlight_file(files["examples"])
+    X_train, y_train = loadExamples(files["examples"])
     #print X_train.shape[1]
     clf.teesFeatureCount = X_train.shape[1] # store the size with a unique name
     if useProbability:
@@ -52,14 +82,17 @@ def classify():
     #print dir(clf)
     #print clf.shape_fit_
     print >> sys.stderr, "Classifying files", files
-    X_train, y_train = load_svmlight_file(files["examples"], clf.teesFeatureCount)
-    out = open(files["predictions"], "wt")
+    classifyFile(clf, files["examples"], files["predictions"])
+
+def classifyFile(clf, examples, predictions):
+    X_train, y_train = loadExamples(examples, clf.teesFeatureCount)
+    out = open(predictions, "wt")
     if clf.teesProba or hasattr(clf, "decision_function"):
         if clf.teesProba:
-            predictions = clf.predict_proba(X_train)
+            scores = clf.predict_proba(X_train)
         else:
-            predictions = clf.decision_function(X_train)
-        for prediction in predictions:
+            scores = clf.decision_function(X_train)
+        for prediction in scores:
             classMax = prediction.argmax() + 1
             out.write(str(classMax) + " " + str(" ".join([str(x) for x in prediction])) + "\n")
             #except: # single value
@@ -69,6 +102,24 @@ def classify():
             out.write(str(int(prediction)) + "\n")        
     out.close()
 
+def serve(modelPath, connection):
+    """
+    Keep a model loaded and classify the (examples, predictions) file pairs received
+    through a multiprocessing connection, until None is received. For each request
+    None is sent back on success, otherwise the error message.
+    """
+    clf = loadClf(modelPath)
+    while True:
+        request = connection.recv()
+        if request == None:
+            break
+        try:
+            classifyFile(clf, request[0], request[1])
+            connection.send(None)
+        except Exception, e:
+            connection.send(repr(e))
+    connection.close()
+
 def getParameters(requireWrapperParams=None):
     params = {}
     wrapperParams = {}
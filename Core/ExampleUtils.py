@@ -20,6 +20,7 @@ import types
 #import Utils.Libraries.combine as combine
 import types
 import gzip
+import struct
 #try:
 #    import xml.etree.cElementTree as ET
 #except ImportError:
@@ -78,6 +79,8 @@ def copyExamples(examples):
     return examplesCopy
 
 def appendExamples(examples, file):
+    if isBinaryFormat(getattr(file, "name", "")):
+        return appendExamplesBinary(examples, file)
     noneClassCount = 0
     for example in examples:
         # None-value as a class indicates a class that did not match an existing id,
@@ -109,29 +112,94 @@ def appendExamples(examples, file):
     if noneClassCount != 0: 
         print >> sys.stderr, "Warning,", noneClassCount, "examples had an undefined class."
 
+# The binary example format stores each example as a little-endian int32 class, an int32
+# feature count n, n int32 feature ids, n float32 feature values and a length-prefixed
+# comment string with the id and extra attributes. Binary files begin with BINARY_HEADER.
+BINARY_HEADER = "TEESBIN1"
+
+def isBinaryFormat(filename):
+    """
+    Example files written with a .bin (or .bin.gz) extension use the binary format
+    """
+    if filename.endswith(".gz"):
+        filename = filename[:-3]
+    return filename.endswith(".bin")
+
+def isBinaryExampleFile(filename):
+    """
+    Detect the binary format from the file header, regardless of the file name
+    """
+    if filename.endswith(".gz"):
+        f = gzip.open(filename,"rb")
+    else:
+        f = open(filename,"rb")
+    header = f.read(len(BINARY_HEADER))
+    f.close()
+    return header == BINARY_HEADER
+
+def _getCommentString(example):
+    comment = "id:" + example[0]
+    for extraKey, extraValue in example[3].iteritems():
+        assert(extraKey != "id") # id must be defined as example[0]
+        if type(extraValue) in types.StringTypes:
+            comment += " " + str(extraKey) + ":" + extraValue
+    if isinstance(comment, unicode):
+        comment = comment.encode("utf-8")
+    return comment
+
 def appendExamplesBinary(examples, file):
-    import struct
+    noneClassCount = 0
     for example in examples:
-        #file.write(str(example[1]))
+        if example[1] == None:
+            noneClassCount += 1
+            continue
         keys = example[2].keys()
         keys.sort()
-        file.write(struct.pack("1i", len(keys)))
-        file.write(struct.pack(str(len(keys))+"i", *keys))
-        #for key in keys:
-        #    file.write(" " + str(key)+":"+str(example[2][key]))
-        #file.write(" # id:" + example[0])
-        #for extraKey, extraValue in example[3].iteritems():
-        #    assert(extraKey != "id")
-        #    if type(extraValue) == types.StringType:
-        #        file.write( " " + str(extraKey) + ":" + extraValue)
-        #file.write("\n")
+        if None in example[2]:
+            keys.remove(None)
+        comment = _getCommentString(example)
+        file.write(struct.pack("<2i", example[1], len(keys)))
+        file.write(struct.pack("<" + str(len(keys)) + "i", *keys))
+        file.write(struct.pack("<" + str(len(keys)) + "f", *[example[2][key] for key in keys]))
+        file.write(struct.pack("<i", len(comment)))
+        file.write(comment)
+    if noneClassCount != 0: 
+        print >> sys.stderr, "Warning,", noneClassCount, "examples had an undefined class."
+
+def readExamplesBinary(file, readFeatures=True):
+    """
+    Read examples from an open binary example file, positioned after the header
+    """
+    while True:
+        data = file.read(8)
+        if len(data) < 8:
+            break
+        classId, featureCount = struct.unpack("<2i", data)
+        data = file.read(8 * featureCount)
+        features = {}
+        if readFeatures and featureCount > 0:
+            keys = struct.unpack("<" + str(featureCount) + "i", data[:4 * featureCount])
+            values = struct.unpack("<" + str(featureCount) + "f", data[4 * featureCount:])
+            features = dict(itertools.izip(keys, values))
+        commentLength = struct.unpack("<i", file.read(4))[0]
+        id = None
+        extra = {}
+        for commentSplit in file.read(commentLength).split():
+            key, value = commentSplit.split(":", 1)
+            if key == "id":
+                id = value
+            else:
+                extra[key] = value
+        yield [id,classId,features,extra]
 
 def writeExamples(examples, filename, commentLines=None):
     if filename.endswith(".gz"):
         f = gzip.open(filename,"wt")
     else:
         f = open(filename,"wt")
-    if commentLines != None:
+    if isBinaryFormat(filename):
+        f.write(BINARY_HEADER)
+    elif commentLines != None:
         for commentLine in commentLines:
             f.write("# "+commentLine+"\n")
     appendExamples(examples, f)
@@ -151,6 +219,8 @@ def writePredictions(predictions, exampleFileName):
             pass
 
 def getIdsFromFile(filename):
+    if isBinaryExampleFile(filename):
+        return [x[0] for x in readExamples(filename, False)]
     if filename.endswith(".gz"):
         f = gzip.open(filename,"rt")
     else:
@@ -169,6 +239,12 @@ def readExamples(filename, readFeatures=True):
         f = gzip.open(filename,"rt")
     else:
         f = open(filename,"rt")
+    if f.read(len(BINARY_HEADER)) == BINARY_HEADER:
+        for example in readExamplesBinary(f, readFeatures):
+            yield example
+        f.close()
+        return
+    f.seek(0)
     #try:
     for line in f:
         if line[0] == "#":
@@ -5,13 +5,21 @@ __version__ = "$Revision: 1.20 $"
 
 import codecs
 import gzip
+import zlib
+
+# The name under which the size of a hashed IdSet is written to its file
+HASH_SIZE_KEY = "__HASH_SIZE__"
 
 class IdSet:
     """
     A mapping from strings to id integers. This class is used for defining the ids for classes
     and features of machine learning systems.
+    
+    A hashed IdSet maps names to ids in the range 1...hashSize through a stable hash, without
+    storing them. Different names can then have the same id, and names can't be retrieved
+    by their ids.
     """ 
-    def __init__(self, firstNumber=1, idDict=None, locked=False, filename=None, allowNewIds=True):
+    def __init__(self, firstNumber=1, idDict=None, locked=False, filename=None, allowNewIds=True, hashSize=None):
         """
         Creates a new IdSet or loads one from a dictionary or a file.
         
@@ -29,10 +37,15 @@ class IdSet:
         @type locked: boolean
         @param filename: load name/id pairs from a file
         @type filename: str
+        @param hashSize: if set, ids are hashed names in the range 1...hashSize
+        @type hashSize: int
         """
         self.Ids = {}
         self.nextFreeId = firstNumber
         self._namesById = {}
+        self.hashSize = None
+        if hashSize != None:
+            self.setHashSize(hashSize)
         self.allowNewIds = allowNewIds # allow new ids when calling getId without specifying "createIfNotExist"
         
         if idDict != None:
@@ -57,7 +70,13 @@ class IdSet:
         @param createIfNotExist: If the name doesn't have an id, define an id for it
         @rtype: int or None
         @return: an identifier
+        
+        For a hashed IdSet, the hashed id is always returned.
         """
+        if self.hashSize != None: # every name has an id
+            if isinstance(key, unicode):
+                key = key.encode("utf-8")
+            return (zlib.crc32(key) & 0xffffffff) % self.hashSize + 1
         if createIfNotExist == None: # no local override to object level setting
             createIfNotExist = self.allowNewIds
         if not self.Ids.has_key(key):
@@ -83,12 +102,23 @@ class IdSet:
         is used only when inserting name/id pairs from an existing source.
         """
         assert(not self.locked)
+        assert(self.hashSize == None)
         assert(not id in self.Ids.values())
         assert(not name in self.Ids.keys())
         assert(id < self.nextFreeId)
         self.Ids[name] = id
         self._namesById[id] = name
     
+    def setHashSize(self, hashSize):
+        """
+        Make this a hashed IdSet with ids in the range 1...hashSize. Existing names are removed.
+        """
+        assert hashSize > 0, hashSize
+        self.hashSize = hashSize
+        self.Ids = {}
+        self._namesById = {}
+        self.nextFreeId = hashSize + 1
+    
     def getName(self, id):
         """
         Returns the name corresponding to the identifier. If the identifier doesn't exits, returns None.
@@ -122,6 +152,7 @@ class IdSet:
     def write(self, filename):
         """
         Writes the name/id pairs to a file, one pair per line, in the format "name: id".
+        For a hashed IdSet, only the hash size is written.
         """
         #f = codecs.open(filename, "wt", "utf-8")
         if filename.endswith(".gz"):
@@ -131,6 +162,8 @@ class IdSet:
             writer = codecs.open(filename, "wt", "utf-8")
             f = writer
         
+        if self.hashSize != None:
+            writer.write(HASH_SIZE_KEY + ": " + str(self.hashSize) + "\n")
         keys = self.Ids.keys()
         keys.sort()
         for key in keys:
@@ -149,6 +182,7 @@ class IdSet:
         self.Ids = {}
         self._namesById = {}
         self.nextFreeId = -999999999999999999
+        self.hashSize = None
         
         #f = codecs.open(filename, "rt", "utf-8")
         if filename.endswith(".gz"):
@@ -164,6 +198,9 @@ class IdSet:
             key, value = line.rsplit(":",1)
             key = key.strip()
             value = int(value.strip())
+            if key == HASH_SIZE_KEY:
+                self.setHashSize(value)
+                continue
             if value >= self.nextFreeId:
                 self.nextFreeId = value + 1
             self.Ids[key] = value
@@ -4,7 +4,9 @@ For storing the results of TEES training.
 import sys, os, shutil
 import filecmp
 import zipfile
+import zlib
 import tempfile
+import warnings
 
 NOTHING = object()
 
@@ -19,6 +21,9 @@ class Model():
     When a model is saved, files that have changed in the cache are copied to the model
     directory/archive. Note that for both files and strings that are added to the model,
     are saved to it only when Model.save is called.
+    
+    Changed files are appended to a model archive, and the old versions are removed
+    only when the model is closed (or Model.pack is called).
     """    
     def __init__(self, path, mode="r", verbose=True, compression=zipfile.ZIP_DEFLATED):
         """
@@ -42,6 +47,8 @@ class Model():
         self.close()
     
     def close(self):
+        if self.path != None and self.mode != "r" and self.isPackage:
+            self.pack()
         if self.workdir != None:
             shutil.rmtree(self.workdir)
         self.workdir = None
@@ -144,7 +151,7 @@ class Model():
                     packageFileInfo = None
                     if name in packageNames:
                         packageFileInfo = package.getinfo(name)
-                    if packageFileInfo == None or cachedInfo.st_size != packageFileInfo.file_size:
+                    if packageFileInfo == None or cachedInfo.st_size != packageFileInfo.file_size or self._getCRC(cached) != packageFileInfo.CRC:
                         changed.append(name)
                 else:
                     modelFilename = os.path.join(self.path, name)
@@ -154,21 +161,57 @@ class Model():
         if len(changed) > 0:
             if self.verbose: print >> sys.stderr, "Saving model \"" + self.path + "\" (cache:" + self.workdir + ", changed:" + ",".join(changed) + ")"
             if self.isPackage:
-                tempdir = tempfile.mkdtemp() # place to unpack existing model
-                package.extractall(tempdir) # unpack model
-                package.close() # close model
-                for name in changed: # add changed files from cache
-                    shutil.copy2(self.members[name], os.path.join(tempdir, name)) # from cache to unpacked model
-                package = zipfile.ZipFile(self.path, "w", self.compression) # recreate the model
-                for name in os.listdir(tempdir): # add all files to model
-                    package.write(os.path.join(tempdir, name), name) # add file from tempdir
-                shutil.rmtree(tempdir) # remove temporary directory
+                package.close()
+                package = zipfile.ZipFile(self.path, "a", self.compression) # append to the model
+                with warnings.catch_warnings(): # the old versions of the files are removed in pack
+                    warnings.filterwarnings("ignore", "Duplicate name")
+                    for name in changed: # add changed files from cache
+                        package.write(self.members[name], name)
             else:
                 for name in changed:
                     shutil.copy2(self.members[name], os.path.join(self.path, name))
         if self.isPackage:
             package.close()     
     
+    def _getCRC(self, filename):
+        crc = 0
+        f = open(filename, "rb")
+        while True:
+            block = f.read(1048576)
+            if not block:
+                break
+            crc = zlib.crc32(block, crc)
+        f.close()
+        return crc & 0xffffffff
+    
+    def pack(self):
+        """
+        Remove the old versions of files that have been replaced in a model archive.
+        
+        Archive members with the same name are read as the last one, so saving a model
+        only appends the changed files to it.
+        """
+        if not self.isPackage:
+            return
+        package = zipfile.ZipFile(self.path, "r")
+        infos = package.infolist()
+        latest = {}
+        for info in infos:
+            latest[info.filename] = info
+        if len(latest) < len(infos):
+            if self.verbose: print >> sys.stderr, "Packing model \"" + self.path + "\""
+            tempdir = tempfile.mkdtemp() # members are unpacked one at a time
+            packed = zipfile.ZipFile(self.path + "-packing", "w", self.compression)
+            for info in infos:
+                if latest[info.filename] is info:
+                    package.extract(info, tempdir)
+                    packed.write(os.path.join(tempdir, info.filename), info.filename)
+                    os.remove(os.path.join(tempdir, info.filename))
+            packed.close()
+            shutil.rmtree(tempdir)
+            os.rename(self.path + "-packing", self.path) # replace the model
+        package.close()
+    
     def saveAs(self, outPath):
         """
         Save a model with a different name.
@@ -184,9 +227,11 @@ class Model():
             # copy current model to new location
             shutil.copy2(self.path, outPath)
             # add cached (potentially updated) files
-            package = zipfile.ZipFile(outPath, "a")
-            for f in os.listdir(self.workdir):
-                package.write(f)
+            package = zipfile.ZipFile(outPath, "a", self.compression)
+            with warnings.catch_warnings(): # the new model may contain older versions of the files
+                warnings.filterwarnings("ignore", "Duplicate name")
+                for f in os.listdir(self.workdir):
+                    package.write(os.path.join(self.workdir, f), f)
             package.close()
         else:
             # copy files from model
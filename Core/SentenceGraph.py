@@ -10,9 +10,17 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/..")
 import Utils.Range as Range
 import types
 import copy
+import bisect
+import hashlib
+import cPickle
+import cStringIO
+import tempfile
 
 #multiedges = True
 
+# Change this when the cached SentenceGraph layout changes, so that old cache files are not used
+CACHE_VERSION = 1
+
 def loadCorpus(corpus, parse, tokenization=None, removeNameInfo=False, removeIntersentenceInteractionsFromCorpusElements=True):
     """
     Load an entire corpus through CorpusElements and add SentenceGraph-objects
@@ -70,44 +78,152 @@ def loadCorpus(corpus, parse, tokenization=None, removeNameInfo=False, removeInt
     print >> sys.stderr, "Skipped", duplicateInteractionEdgesRemoved, "duplicate interaction edges in SentenceGraphs"
     return corpusElements
 
-def getCorpusIterator(input, output, parse, tokenization=None, removeNameInfo=False, removeIntersentenceInteractions=True):
+def getCorpusIterator(input, output, parse, tokenization=None, removeNameInfo=False, removeIntersentenceInteractions=True, documentRange=None, cacheDir=None):
+    """
+    Iterate over the documents of a corpus, yielding for each a list of SentenceElements
+    objects with their SentenceGraphs.
+    
+    If cacheDir is defined, the sentences built from a corpus file are cached there and
+    read from the cache the next time the same file is iterated with the same options.
+    """
     import Utils.ElementTreeUtils as ETUtils
     from Utils.InteractionXML.SentenceElements import SentenceElements
     #import xml.etree.cElementTree as ElementTree
     
-    if output != None:
-        etWriter = ETUtils.ETWriter(output)
-    for eTuple in ETUtils.ETIteratorFromObj(input, ("start", "end")):
-        element = eTuple[1]
-        if eTuple[0] in ["end", "memory"] and element.tag == "document":
-            sentences = []
-            for sentenceElement in element.findall("sentence"):
-                #print ElementTree.tostring(sentenceElement)
-                sentence = SentenceElements(sentenceElement, parse, tokenization, removeIntersentenceInteractions=removeIntersentenceInteractions)
-                if len(sentence.tokens) == 0 or len(sentence.dependencies) == 0: 
-                    sentence.sentenceGraph = None
+    cachePath = None
+    cacheFile = None
+    if cacheDir != None and output == None and isinstance(input, basestring):
+        cachePath = getCachePath(input, cacheDir, parse, tokenization, removeNameInfo, removeIntersentenceInteractions)
+        if os.path.exists(cachePath):
+            print >> sys.stderr, "Reading sentence graphs from cache", cachePath
+            for sentences in iterCachedDocuments(cachePath, documentRange):
+                yield sentences
+            return
+        if documentRange == None: # only a complete iteration is cached
+            if not os.path.exists(cacheDir):
+                os.makedirs(cacheDir)
+            cacheFile = tempfile.NamedTemporaryFile(dir=cacheDir, suffix=".sentence-graphs-temp", delete=False)
+    try:
+        if output != None:
+            etWriter = ETUtils.ETWriter(output)
+        documentIndex = -1
+        for eTuple in ETUtils.ETIteratorFromObj(input, ("start", "end")):
+            element = eTuple[1]
+            if eTuple[0] in ["end", "memory"] and element.tag == "document":
+                documentIndex += 1
+                if documentRange != None: # only the documents in the range [begin, end) are processed
+                    if documentRange[1] != None and documentIndex >= documentRange[1] and output == None:
+                        break
+                    if documentIndex < documentRange[0] or (documentRange[1] != None and documentIndex >= documentRange[1]):
+                        if eTuple[0] == "end":
+                            element.clear()
+                        continue
+                sentences = []
+                for sentenceElement in element.findall("sentence"):
+                    #print ElementTree.tostring(sentenceElement)
+                    sentence = SentenceElements(sentenceElement, parse, tokenization, removeIntersentenceInteractions=removeIntersentenceInteractions)
+                    if len(sentence.tokens) == 0 or len(sentence.dependencies) == 0: 
+                        sentence.sentenceGraph = None
+                    else:
+                        # Construct the basic SentenceGraph (only syntactic information)
+                        graph = SentenceGraph(sentence.sentence, sentence.tokens, sentence.dependencies)
+                        # Add semantic information, i.e. the interactions
+                        graph.mapInteractions(sentence.entities, sentence.interactions)
+                        graph.interSentenceInteractions = sentence.interSentenceInteractions
+                        #duplicateInteractionEdgesRemoved += graph.duplicateInteractionEdgesRemoved
+                        sentence.sentenceGraph = graph
+                        graph.parseElement = sentence.parseElement
+                    sentences.append(sentence)
+                if cacheFile != None:
+                    cacheFile = writeCachedDocument(element, sentences, cacheFile)
+                yield sentences
+                if output != None:
+                    etWriter.write(element)
+            elif element.tag == "corpus" and output != None:
+                if eTuple[0] == "start":
+                    etWriter.begin(element)
                 else:
-                    # Construct the basic SentenceGraph (only syntactic information)
-                    graph = SentenceGraph(sentence.sentence, sentence.tokens, sentence.dependencies)
-                    # Add semantic information, i.e. the interactions
-                    graph.mapInteractions(sentence.entities, sentence.interactions)
-                    graph.interSentenceInteractions = sentence.interSentenceInteractions
-                    #duplicateInteractionEdgesRemoved += graph.duplicateInteractionEdgesRemoved
-                    sentence.sentenceGraph = graph
-                    graph.parseElement = sentence.parseElement
-                sentences.append(sentence)
-            yield sentences
-            if output != None:
-                etWriter.write(element)
-        elif element.tag == "corpus" and output != None:
-            if eTuple[0] == "start":
-                etWriter.begin(element)
-            else:
-                etWriter.end(element)
-        if eTuple[0] == "end" and element.tag in ["document", "corpus"]:
-            element.clear()
-    if output != None:
-        etWriter.close()
+                    etWriter.end(element)
+            if eTuple[0] == "end" and element.tag in ["document", "corpus"]:
+                element.clear()
+        if output != None:
+            etWriter.close()
+        if cacheFile != None:
+            cacheFile.close()
+            os.rename(cacheFile.name, cachePath)
+            cacheFile = None
+    finally:
+        if cacheFile != None: # the iteration failed or was not completed
+            cacheFile.close()
+            os.remove(cacheFile.name)
+
+def getCachePath(input, cacheDir, parse, tokenization, removeNameInfo, removeIntersentenceInteractions):
+    """
+    The sentence graph cache file for a corpus file is named by a hash of the file's 
+    content and of the options the graphs are built with.
+    """
+    md5 = hashlib.md5()
+    f = open(input, "rb")
+    while True:
+        block = f.read(1048576)
+        if not block:
+            break
+        md5.update(block)
+    f.close()
+    md5.update(repr((CACHE_VERSION, parse, tokenization, removeNameInfo, removeIntersentenceInteractions)))
+    return os.path.join(cacheDir, md5.hexdigest() + ".sentence-graphs")
+
+def writeCachedDocument(document, sentences, cacheFile):
+    """
+    Append a document and its sentences to a cache file. The document is stored as
+    XML and the sentences are pickled with their references to the document's elements
+    replaced by element indices. Returns None, with the cache file removed, if the 
+    sentences refer to elements outside the document.
+    """
+    elementType = type(document)
+    elementIndices = dict([(id(x), i) for i, x in enumerate(document.iter())])
+    def getElementIndex(obj):
+        if type(obj) == elementType:
+            return elementIndices[id(obj)]
+        return None
+    buffer = cStringIO.StringIO()
+    pickler = cPickle.Pickler(buffer, cPickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = getElementIndex
+    try:
+        pickler.dump(sentences)
+    except KeyError:
+        print >> sys.stderr, "Warning, sentences of document", document.get("id"), "can't be cached"
+        cacheFile.close()
+        os.remove(cacheFile.name)
+        return None
+    import Utils.ElementTreeUtils as ETUtils
+    cPickle.dump((ETUtils.ElementTree.tostring(document, "utf-8"), buffer.getvalue()), cacheFile, cPickle.HIGHEST_PROTOCOL)
+    return cacheFile
+
+def iterCachedDocuments(cachePath, documentRange=None):
+    """
+    Read the documents written by writeCachedDocument, yielding the sentences of each
+    document, with their element references pointing to the reparsed document.
+    """
+    import Utils.ElementTreeUtils as ETUtils
+    f = open(cachePath, "rb")
+    documentIndex = -1
+    while True:
+        try:
+            xml, pickled = cPickle.load(f)
+        except EOFError:
+            break
+        documentIndex += 1
+        if documentRange != None:
+            if documentRange[1] != None and documentIndex >= documentRange[1]:
+                break
+            if documentIndex < documentRange[0]:
+                continue
+        elements = list(ETUtils.ElementTree.fromstring(xml).iter())
+        unpickler = cPickle.Unpickler(cStringIO.StringIO(pickled))
+        unpickler.persistent_load = elements.__getitem__
+        yield unpickler.load()
+    f.close()
 
 class SentenceGraph:
     """
@@ -148,6 +264,7 @@ class SentenceGraph:
         self.mergedEntities = None
         self.mergedEntityToDuplicates = None
         self.mergedEntityGraph = None
+        self.tokenOffsetIndex = None
         
         self.tokensById = {}
         for token in self.tokens:
@@ -345,6 +462,29 @@ class SentenceGraph:
                 # TODO: "skipped" would be better than "removed"
                 self.duplicateInteractionEdgesRemoved += 1
     
+    def getOverlappingTokenIndices(self, offset):
+        """
+        Returns the indices of the tokens whose character offsets overlap the offset.
+        
+        The tokens are indexed by their begin offsets, so only those that can reach
+        the offset need to be compared with it.
+        
+        @param offset: a character offset tuple
+        """
+        if self.tokenOffsetIndex == None:
+            tokenOffsets = [Range.charOffsetToSingleTuple(x.get("charOffset")) for x in self.tokens]
+            order = sorted(range(len(self.tokens)), key=lambda i: tokenOffsets[i][0])
+            maxLength = max([x[1] - x[0] for x in tokenOffsets] + [0])
+            self.tokenOffsetIndex = ([tokenOffsets[i][0] for i in order], [tokenOffsets[i] for i in order], order, maxLength)
+        begins, tokenOffsets, order, maxLength = self.tokenOffsetIndex
+        # A token can overlap the offset only if it begins before the offset ends, and 
+        # no token that begins more than maxLength before the offset can reach it 
+        indices = []
+        for i in range(bisect.bisect_right(begins, offset[0] - maxLength), bisect.bisect_left(begins, offset[1])):
+            if Range.overlap(offset, tokenOffsets[i]):
+                indices.append(order[i])
+        return indices
+    
     def mapEntity(self, entityElement, verbose=False):
         """
         Determine the head token for a named entity or trigger. The head token is the token closest
@@ -365,20 +505,20 @@ class SentenceGraph:
         # Each entity can consist of multiple syntactic tokens, covered by its
         # charOffset-range. One of these must be chosen as the head token.
         headTokens = [] # potential head tokens
-        for token in self.tokens:
-            #print token.attrib["id"], token.attrib["charOffset"]
-            tokenOffset = Range.charOffsetToSingleTuple(token.get("charOffset"))
-            if headOffset != None and entityElement.get("type") != "Binding":
-                # A head token can already be defined in the headOffset-attribute.
-                # However, depending on the tokenization, even this range may
-                # contain multiple tokens. Still, it can always be assumed that
-                # if headOffset is defined, the corret head token is in this range.
-                if Range.overlap(headOffset,tokenOffset):
-                    headTokens.append(token)
-            else:
-                for offset in charOffsets:
-                    if Range.overlap(offset,tokenOffset):
-                        headTokens.append(token)
+        if headOffset != None and entityElement.get("type") != "Binding":
+            # A head token can already be defined in the headOffset-attribute.
+            # However, depending on the tokenization, even this range may
+            # contain multiple tokens. Still, it can always be assumed that
+            # if headOffset is defined, the corret head token is in this range.
+            headOffsets = [headOffset]
+        else:
+            headOffsets = charOffsets
+        # A token overlapping several of the offsets is a candidate for each of them
+        tokenIndices = []
+        for offset in headOffsets:
+            tokenIndices.extend(self.getOverlappingTokenIndices(offset))
+        for tokenIndex in sorted(tokenIndices): # keep the candidates in sentence order
+            headTokens.append(self.tokens[tokenIndex])
         if len(headTokens)==1: # An unambiguous head token was found
             token = headTokens[0]
         else: # One head token must be chosen from the candidates
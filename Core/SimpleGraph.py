@@ -227,6 +227,57 @@ class Graph:
                             self.__nextInPath[i][j].append(k)
         #self.showAnalyses()
     
+    def BreadthFirst(self, filterCallback=None, callbackArgs={}):
+        """
+        All-pairs shortest paths with one breadth-first search per node. The graph is
+        unweighted, so this produces the same distance and path traversal tables as
+        FloydWarshall in O(n*e) time instead of O(n^3).
+        """
+        infinity = sys.maxint
+        nodeIndex = {}
+        for i in range(len(self.nodes)):
+            nodeIndex[self.nodes[i]] = i
+        # Collect the neighbours of each node, in node order
+        neighbours = {}
+        for n1 in self.nodes:
+            neighbours[n1] = []
+            for n2 in sorted(self.__matrix[n1].keys(), key=lambda x: nodeIndex[x]):
+                if n1 == n2:
+                    continue
+                edges = self.__matrix[n1][n2]
+                if filterCallback != None: # permanent implementation of the DDI hack
+                    edges = [x for x in edges if not filterCallback(x, **callbackArgs)]
+                if len(edges) > 0:
+                    neighbours[n1].append(n2)
+        # Calculate distances
+        self.__distances = {}
+        for source in self.nodes:
+            distances = dict.fromkeys(self.nodes, infinity)
+            distances[source] = 0
+            frontier = [source]
+            depth = 0
+            while len(frontier) > 0:
+                depth += 1
+                nextFrontier = []
+                for n1 in frontier:
+                    for n2 in neighbours[n1]:
+                        if distances[n2] == infinity:
+                            distances[n2] = depth
+                            nextFrontier.append(n2)
+                frontier = nextFrontier
+            self.__distances[source] = distances
+        # Init path traversal matrix
+        d = self.__distances
+        self.__nextInPath = {}
+        for i in self.nodes:
+            self.__nextInPath[i] = dict.fromkeys(self.nodes, None)
+            for j in self.nodes:
+                if d[i][j] == infinity or d[i][j] < 2:
+                    continue
+                intermediates = [k for k in neighbours[i] if d[k][j] == d[i][j] - 1]
+                if len(intermediates) > 0:
+                    self.__nextInPath[i][j] = intermediates
+    
     def resetAnalyses(self):
         self.__nextInPath = None
         self.__distances = None
@@ -234,7 +285,7 @@ class Graph:
     
     def showAnalyses(self):
         if self.__nextInPath == None:
-            self.FloydWarshall()
+            self.BreadthFirst()
         print "distances"
         for k in sorted(self.__distances.keys()):
             print ">", k, self.__distances[k]
@@ -244,7 +295,7 @@ class Graph:
 
     def getPaths(self, i, j, depth=0):
         if self.__nextInPath == None:
-            self.FloydWarshall()
+            self.BreadthFirst()
         if self.__distances[i][j] == sys.maxint: # no path
             return []
         intermediates = self.__nextInPath[i][j]
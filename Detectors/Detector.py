@@ -10,7 +10,6 @@ from Core.Model import Model
 from StepSelector import StepSelector
 from StructureAnalyzer import StructureAnalyzer
 import Utils.Parameters as Parameters
-import Evaluators.BioNLP11GeniaTools
 import types
 import time, datetime
 
@@ -27,11 +26,12 @@ class Detector():
     def __init__(self):
         self.structureAnalyzer = StructureAnalyzer()
         self.exampleBuilder = None
+        self.exampleBuilderWorkers = None # number of parallel example building processes
         self.exampleWriter = None
         self.Classifier = None
         self.evaluator = None
         self.bioNLPSTParams = None
-        self.stEvaluator = Evaluators.BioNLP11GeniaTools
+        self.stEvaluator = None # the BioNLP Shared Task evaluator module, imported when needed
         self.modelPath = None
         self.combinedModelPath = None
         self.tag = "UNKNOWN-"
@@ -39,6 +39,7 @@ class Detector():
         self.combinedModel = None
         self.workDir = ""
         self.workDirIsTempDir = False
+        self.classifyOutput = None # the output stem of the current classification
         
         self.exampleStyle = None
         self.classifierParameters = None
@@ -63,7 +64,25 @@ class Detector():
         for model in self.modelsToClose:
             model.close()
     
+    def getStepProfilePath(self):
+        """
+        The file where the resource use of the steps is recorded. It is written to the work
+        directory, or when there is none (or it is temporary) next to the classification output.
+        Without either nothing is recorded.
+        """
+        if self.workDir != "" and not self.workDirIsTempDir:
+            return self.workDir + "step-profile.tsv"
+        elif self.classifyOutput != None:
+            return self.classifyOutput + "-step-profile.tsv"
+        return None
+    
+    def _setStepProfile(self):
+        if self.select != None:
+            self.select.profileFile = self.getStepProfilePath() # the work directory can be set after entering the state
+            self.select.profileName = self.__class__.__name__ + ":" + self.state
+    
     def checkStep(self, step, verbose=True):
+        self._setStepProfile()
         if self.select == None or self.select.check(step):
             if verbose: print >> sys.stderr, "=== ENTER STEP", self.__class__.__name__ + ":" + self.state + ":" + step, "==="
             return True
@@ -183,7 +202,13 @@ class Detector():
             else:
                 parameters = {}
         return Parameters.get(parameters, ["convert", "evaluate", "scores", "a2Tag"])
-    
+
+    def getSTEvaluator(self):
+        if self.stEvaluator == None:
+            import Evaluators.BioNLP11GeniaTools
+            self.stEvaluator = Evaluators.BioNLP11GeniaTools
+        return self.stEvaluator
+
     def buildExamples(self, model, datas, outputs, golds=[], exampleStyle=None, saveIdsToModel=False, parse=None):
         if exampleStyle == None:
             exampleStyle = model.getStr(self.tag+"example-style")
@@ -200,7 +225,7 @@ class Detector():
                 if dataSet != None:
                     self.exampleBuilder.run(dataSet, output, parse, None, exampleStyle, model.get(self.tag+"ids.classes", 
                         True), model.get(self.tag+"ids.features", True), goldSet, append, saveIdsToModel,
-                        structureAnalyzer=self.structureAnalyzer)
+                        structureAnalyzer=self.structureAnalyzer, workers=self.exampleBuilderWorkers)
                 append = True
         if hasattr(self.structureAnalyzer, "typeMap") and model.mode != "r":
             print >> sys.stderr, "Saving StructureAnalyzer.typeMap"
@@ -248,6 +273,7 @@ class Detector():
             print >> sys.stderr, "*", self.__class__.__name__ + ":" + self.state + "(EXIT)", str(datetime.timedelta(seconds=time.time()-self.enterStateTime)), "*"
             self.state = None
             self.select = None
+            self.classifyOutput = None
             for name in self.variablesToRemove:
                 if hasattr(self, name):
                     delattr(self, name)
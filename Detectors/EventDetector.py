@@ -12,9 +12,6 @@ import Utils.Parameters as Parameters
 from Utils.Libraries.combine import combine
 import Utils.InteractionXML as InteractionXML
 import Evaluators.EvaluateInteractionXML as EvaluateInteractionXML
-import Utils.STFormat.ConvertXML
-import Utils.STFormat.Compare
-import Evaluators.BioNLP11GeniaTools
 
 class EventDetector(Detector):
     """
@@ -109,53 +106,56 @@ class EventDetector(Detector):
             if not self.structureAnalyzer.isInitialized():
                 self.structureAnalyzer.load(self.model)
             self.trainModifiers = self.structureAnalyzer.hasModifiers()
+        triggerSuffix = self.triggerDetector.getExampleSuffix(self.model)
+        edgeSuffix = self.edgeDetector.getExampleSuffix(self.model)
+        modifierSuffix = self.modifierDetector.getExampleSuffix(self.model)
         if self.checkStep("EXAMPLES"):
-            self.triggerDetector.buildExamples(self.model, [optData.replace("-nodup", ""), trainData.replace("-nodup", "")], [self.workDir+self.triggerDetector.tag+"opt-examples.gz", self.workDir+self.triggerDetector.tag+"train-examples.gz"], saveIdsToModel=True)
-            self.edgeDetector.buildExamples(self.model, [optData.replace("-nodup", ""), trainData.replace("-nodup", "")], [self.workDir+self.edgeDetector.tag+"opt-examples.gz", self.workDir+self.edgeDetector.tag+"train-examples.gz"], saveIdsToModel=True)
+            self.triggerDetector.buildExamples(self.model, [optData.replace("-nodup", ""), trainData.replace("-nodup", "")], [self.workDir+self.triggerDetector.tag+"opt-examples"+triggerSuffix, self.workDir+self.triggerDetector.tag+"train-examples"+triggerSuffix], saveIdsToModel=True)
+            self.edgeDetector.buildExamples(self.model, [optData.replace("-nodup", ""), trainData.replace("-nodup", "")], [self.workDir+self.edgeDetector.tag+"opt-examples"+edgeSuffix, self.workDir+self.edgeDetector.tag+"train-examples"+edgeSuffix], saveIdsToModel=True)
             if self.trainModifiers:
-                self.modifierDetector.buildExamples(self.model, [optData, trainData], [self.workDir+self.modifierDetector.tag+"opt-examples.gz", self.workDir+self.modifierDetector.tag+"train-examples.gz"], saveIdsToModel=True)             
+                self.modifierDetector.buildExamples(self.model, [optData, trainData], [self.workDir+self.modifierDetector.tag+"opt-examples"+modifierSuffix, self.workDir+self.modifierDetector.tag+"train-examples"+modifierSuffix], saveIdsToModel=True)             
         if self.checkStep("BEGIN-MODEL"):
             #for model in [self.model, self.combinedModel]:
             #    if model != None:
             #        model.addStr("BioNLPSTParams", Parameters.toString(self.bioNLPSTParams))
             self.triggerDetector.bioNLPSTParams = self.bioNLPSTParams
-            self.triggerDetector.beginModel(None, self.model, [self.workDir+self.triggerDetector.tag+"train-examples.gz"], self.workDir+self.triggerDetector.tag+"opt-examples.gz")
-            self.edgeDetector.beginModel(None, self.model, [self.workDir+self.edgeDetector.tag+"train-examples.gz"], self.workDir+self.edgeDetector.tag+"opt-examples.gz")
+            self.triggerDetector.beginModel(None, self.model, [self.workDir+self.triggerDetector.tag+"train-examples"+triggerSuffix], self.workDir+self.triggerDetector.tag+"opt-examples"+triggerSuffix)
+            self.edgeDetector.beginModel(None, self.model, [self.workDir+self.edgeDetector.tag+"train-examples"+edgeSuffix], self.workDir+self.edgeDetector.tag+"opt-examples"+edgeSuffix)
             if self.trainModifiers:
-                self.modifierDetector.beginModel(None, self.model, [self.workDir+self.modifierDetector.tag+"train-examples.gz"], self.workDir+self.modifierDetector.tag+"opt-examples.gz")
+                self.modifierDetector.beginModel(None, self.model, [self.workDir+self.modifierDetector.tag+"train-examples"+modifierSuffix], self.workDir+self.modifierDetector.tag+"opt-examples"+modifierSuffix)
         if self.checkStep("END-MODEL"):
-            self.triggerDetector.endModel(None, self.model, self.workDir+self.triggerDetector.tag+"opt-examples.gz")
-            self.edgeDetector.endModel(None, self.model, self.workDir+self.edgeDetector.tag+"opt-examples.gz")
+            self.triggerDetector.endModel(None, self.model, self.workDir+self.triggerDetector.tag+"opt-examples"+triggerSuffix)
+            self.edgeDetector.endModel(None, self.model, self.workDir+self.edgeDetector.tag+"opt-examples"+edgeSuffix)
             if self.trainModifiers:
-                self.modifierDetector.endModel(None, self.model, self.workDir+self.modifierDetector.tag+"opt-examples.gz")
+                self.modifierDetector.endModel(None, self.model, self.workDir+self.modifierDetector.tag+"opt-examples"+modifierSuffix)
         if self.checkStep("BEGIN-COMBINED-MODEL"):
             if not self.fullGrid:
                 print >> sys.stderr, "Training combined model before grid search"
-                self.triggerDetector.beginModel(None, self.combinedModel, [self.workDir+self.triggerDetector.tag+"train-examples.gz", self.workDir+self.triggerDetector.tag+"opt-examples.gz"], self.workDir+self.triggerDetector.tag+"opt-examples.gz", self.model)
-                self.edgeDetector.beginModel(None, self.combinedModel, [self.workDir+self.edgeDetector.tag+"train-examples.gz", self.workDir+self.edgeDetector.tag+"opt-examples.gz"], self.workDir+self.edgeDetector.tag+"opt-examples.gz", self.model)
+                self.triggerDetector.beginModel(None, self.combinedModel, [self.workDir+self.triggerDetector.tag+"train-examples"+triggerSuffix, self.workDir+self.triggerDetector.tag+"opt-examples"+triggerSuffix], self.workDir+self.triggerDetector.tag+"opt-examples"+triggerSuffix, self.model)
+                self.edgeDetector.beginModel(None, self.combinedModel, [self.workDir+self.edgeDetector.tag+"train-examples"+edgeSuffix, self.workDir+self.edgeDetector.tag+"opt-examples"+edgeSuffix], self.workDir+self.edgeDetector.tag+"opt-examples"+edgeSuffix, self.model)
             else:
                 print >> sys.stderr, "Combined model will be trained after grid search"
             if self.trainModifiers:
                 print >> sys.stderr, "Training combined model for modifier detection"
-                self.modifierDetector.beginModel(None, self.combinedModel, [self.workDir+self.modifierDetector.tag+"train-examples.gz", self.workDir+self.modifierDetector.tag+"opt-examples.gz"], self.workDir+self.modifierDetector.tag+"opt-examples.gz", self.model)
+                self.modifierDetector.beginModel(None, self.combinedModel, [self.workDir+self.modifierDetector.tag+"train-examples"+modifierSuffix, self.workDir+self.modifierDetector.tag+"opt-examples"+modifierSuffix], self.workDir+self.modifierDetector.tag+"opt-examples"+modifierSuffix, self.model)
         self.trainUnmergingDetector()
         if self.checkStep("GRID"):
             self.doGrid()
         if self.checkStep("BEGIN-COMBINED-MODEL-FULLGRID"):
             if self.fullGrid:
                 print >> sys.stderr, "Training combined model after grid search"
-                self.triggerDetector.beginModel(None, self.combinedModel, [self.workDir+self.triggerDetector.tag+"train-examples.gz", self.workDir+self.triggerDetector.tag+"opt-examples.gz"], self.workDir+self.triggerDetector.tag+"opt-examples.gz", self.model)
-                self.edgeDetector.beginModel(None, self.combinedModel, [self.workDir+self.edgeDetector.tag+"train-examples.gz", self.workDir+self.edgeDetector.tag+"opt-examples.gz"], self.workDir+self.edgeDetector.tag+"opt-examples.gz", self.model)
+                self.triggerDetector.beginModel(None, self.combinedModel, [self.workDir+self.triggerDetector.tag+"train-examples"+triggerSuffix, self.workDir+self.triggerDetector.tag+"opt-examples"+triggerSuffix], self.workDir+self.triggerDetector.tag+"opt-examples"+triggerSuffix, self.model)
+                self.edgeDetector.beginModel(None, self.combinedModel, [self.workDir+self.edgeDetector.tag+"train-examples"+edgeSuffix, self.workDir+self.edgeDetector.tag+"opt-examples"+edgeSuffix], self.workDir+self.edgeDetector.tag+"opt-examples"+edgeSuffix, self.model)
                 if self.trainModifiers:
                     print >> sys.stderr, "Training combined model for modifier detection"
-                    self.modifierDetector.beginModel(None, self.combinedModel, [self.workDir+self.modifierDetector.tag+"train-examples.gz", self.workDir+self.modifierDetector.tag+"opt-examples.gz"], self.workDir+self.modifierDetector.tag+"opt-examples.gz", self.model)
+                    self.modifierDetector.beginModel(None, self.combinedModel, [self.workDir+self.modifierDetector.tag+"train-examples"+modifierSuffix, self.workDir+self.modifierDetector.tag+"opt-examples"+modifierSuffix], self.workDir+self.modifierDetector.tag+"opt-examples"+modifierSuffix, self.model)
             else:
                 print >> sys.stderr, "Combined model has been trained before grid search"
         if self.checkStep("END-COMBINED-MODEL"):
-            self.triggerDetector.endModel(None, self.combinedModel, self.workDir+self.triggerDetector.tag+"opt-examples.gz")
-            self.edgeDetector.endModel(None, self.combinedModel, self.workDir+self.edgeDetector.tag+"opt-examples.gz")
+            self.triggerDetector.endModel(None, self.combinedModel, self.workDir+self.triggerDetector.tag+"opt-examples"+triggerSuffix)
+            self.edgeDetector.endModel(None, self.combinedModel, self.workDir+self.edgeDetector.tag+"opt-examples"+edgeSuffix)
             if self.trainModifiers:
-                self.modifierDetector.endModel(None, self.combinedModel, self.workDir+self.modifierDetector.tag+"opt-examples.gz")
+                self.modifierDetector.endModel(None, self.combinedModel, self.workDir+self.modifierDetector.tag+"opt-examples"+modifierSuffix)
         # End the training process ####################################
         if workDir != None:
             self.setWorkDir("")
@@ -230,11 +230,12 @@ class EventDetector(Detector):
             self.edgeDetector.addClassifierModel(self.model, EDGE_MODEL_STEM+str(bestResults[0]["edge"]), bestResults[0]["edge"])
         # Remove work files
         for stepTag in [self.workDir+"grid-trigger", self.workDir+"grid-edge", self.workDir+"grid-unmerging"]:
-            for fileStem in ["-classifications", "-classifications.log", "examples.gz", "pred.xml.gz"]:
+            for fileStem in ["-classifications", "-classifications.log", "examples.gz", "examples.bin.gz", "pred.xml.gz"]:
                 if os.path.exists(stepTag+fileStem):
                     os.remove(stepTag+fileStem)
     
     def evaluateGrid(self, xml, params, bestResults):
+        import Utils.STFormat.ConvertXML
         if xml != None:                
             # TODO: Where should the EvaluateInteractionXML evaluator come from?
             EIXMLResult = EvaluateInteractionXML.run(self.edgeDetector.evaluator, xml, self.optData, self.parse)
@@ -253,7 +254,7 @@ class EventDetector(Detector):
             # Attempt shared task evaluation
             stEvaluation = None
             if self.bioNLPSTParams["evaluate"]:
-                stEvaluation = self.stEvaluator.evaluate(stFormatDir, self.task)
+                stEvaluation = self.getSTEvaluator().evaluate(stFormatDir, self.task)
             if stEvaluation != None:
                 if bestResults == None or stEvaluation[0] > bestResults[1][0]:
                     bestResults = (params, stEvaluation, stEvaluation[0])
@@ -271,6 +272,7 @@ class EventDetector(Detector):
 
     def trainUnmergingDetector(self):
         xml = None
+        unmergingSuffix = self.unmergingDetector.getExampleSuffix(self.model)
         if not self.unmerging:
             print >> sys.stderr, "No unmerging"
         if self.checkStep("SELF-TRAIN-EXAMPLES-FOR-UNMERGING", self.unmerging) and self.unmerging:
@@ -298,21 +300,21 @@ class EventDetector(Detector):
                 if xml == None: 
                     xml = self.workDir+"unmerging-extra-edge-pred.xml.gz"
                 self.unmergingDetector.buildExamples(self.model, [self.optData.replace("-nodup", ""), [self.trainData.replace("-nodup", ""), xml]], 
-                                                     [self.workDir+"unmerging-opt-examples.gz", self.workDir+"unmerging-train-examples.gz"], 
+                                                     [self.workDir+"unmerging-opt-examples"+unmergingSuffix, self.workDir+"unmerging-train-examples"+unmergingSuffix], 
                                                      [GOLD_TEST_FILE, [GOLD_TRAIN_FILE, GOLD_TRAIN_FILE]], 
                                                      exampleStyle=self.unmergingExampleStyle, saveIdsToModel=True)
                 xml = None
             else:
                 self.unmergingDetector.buildExamples(self.model, [self.optData.replace("-nodup", ""), self.trainData.replace("-nodup", "")], 
-                                                     [self.workDir+"unmerging-opt-examples.gz", self.workDir+"unmerging-train-examples.gz"], 
+                                                     [self.workDir+"unmerging-opt-examples"+unmergingSuffix, self.workDir+"unmerging-train-examples"+unmergingSuffix], 
                                                      [GOLD_TEST_FILE, GOLD_TRAIN_FILE], 
                                                      exampleStyle=self.unmergingExampleStyle, saveIdsToModel=True)
                 xml = None
             #UnmergingExampleBuilder.run("/home/jari/biotext/EventExtension/TrainSelfClassify/test-predicted-edges.xml", GOLD_TRAIN_FILE, UNMERGING_TRAIN_EXAMPLE_FILE, PARSE, TOK, UNMERGING_FEATURE_PARAMS, UNMERGING_IDS, append=True)
         if self.checkStep("BEGIN-UNMERGING-MODEL", self.unmerging) and self.unmerging:
-            self.unmergingDetector.beginModel(None, self.model, self.workDir+"unmerging-train-examples.gz", self.workDir+"unmerging-opt-examples.gz")
+            self.unmergingDetector.beginModel(None, self.model, self.workDir+"unmerging-train-examples"+unmergingSuffix, self.workDir+"unmerging-opt-examples"+unmergingSuffix)
         if self.checkStep("END-UNMERGING-MODEL", self.unmerging) and self.unmerging:
-            self.unmergingDetector.endModel(None, self.model, self.workDir+"unmerging-opt-examples.gz")
+            self.unmergingDetector.endModel(None, self.model, self.workDir+"unmerging-opt-examples"+unmergingSuffix)
             print >> sys.stderr, "Adding unmerging classifier model to test-set event model"
             if self.combinedModel != None:
                 self.combinedModel.addStr("unmerging-example-style", self.model.getStr("unmerging-example-style"))
@@ -332,6 +334,7 @@ class EventDetector(Detector):
         self.setWorkDir(workDir)
         if workDir == None:
             self.setTempWorkDir()
+        self.classifyOutput = output
         workOutputTag = os.path.join(self.workDir, os.path.basename(output) + "-")
         self.model = self.openModel(self.model, "r")
         stParams = self.getBioNLPSharedTaskParams(self.bioNLPSTParams, model)
@@ -384,6 +387,7 @@ class EventDetector(Detector):
 #            ETUtils.write(xml, workOutputTag + "validate-pred.xml.gz")
         if self.checkStep("ST-CONVERT"):
             if stParams["convert"]:
+                import Utils.STFormat.ConvertXML
                 extension = ".zip" if (stParams["convert"] == "zip") else ".tar.gz" 
                 #xml = self.getWorkFile(xml, [workOutputTag + "validate-pred.xml.gz", workOutputTag + "modifier-pred.xml.gz", workOutputTag + "unmerging-pred.xml.gz", workOutputTag + "edge-pred.xml.gz"])
                 xml = self.getWorkFile(xml, [workOutputTag + "modifier-pred.xml.gz", workOutputTag + "unmerging-pred.xml.gz", workOutputTag + "edge-pred.xml.gz"])
@@ -392,7 +396,7 @@ class EventDetector(Detector):
                     task = self.task
                     if task == None:
                         task = self.getStr(self.edgeDetector.tag+"task", self.model)
-                    self.stEvaluator.evaluate(output + "-events" + extension, task)
+                    self.getSTEvaluator().evaluate(output + "-events" + extension, task)
             else:
                 print >> sys.stderr, "No BioNLP shared task format conversion"
         finalXMLFile = self.getWorkFile(None, [workOutputTag + "modifier-pred.xml.gz", workOutputTag + "unmerging-pred.xml.gz", workOutputTag + "edge-pred.xml.gz"])
@@ -3,7 +3,6 @@ from ExampleBuilders.ModifierExampleBuilder import ModifierExampleBuilder
 from ExampleWriters.ModifierExampleWriter import ModifierExampleWriter
 from Classifiers.SVMMultiClassClassifier import SVMMultiClassClassifier
 from Evaluators.AveragingMultiClassEvaluator import AveragingMultiClassEvaluator
-import Evaluators.BioNLP11GeniaTools
 
 class ModifierDetector(SingleStageDetector):
     """
@@ -15,5 +14,4 @@ class ModifierDetector(SingleStageDetector):
         self.exampleWriter = ModifierExampleWriter()
         self.Classifier = SVMMultiClassClassifier
         self.evaluator = AveragingMultiClassEvaluator
-        self.stEvaluator = Evaluators.BioNLP11GeniaTools
         self.tag = "modifier-"
\ No newline at end of file
@@ -3,21 +3,21 @@ import itertools
 import types
 thisPath = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.abspath(os.path.join(thisPath,"..")))
-import Utils.STFormat.STTools
-import Utils.STFormat.ConvertXML
-import Utils.STFormat.Equiv
 import Utils.ElementTreeUtils as ETUtils
-import Tools.GeniaSentenceSplitter
-import Tools.BLLIPParser
-import Tools.StanfordParser
-import Tools.BANNER
 from ToolChain import ToolChain
-import Utils.InteractionXML.DivideSets
-import Utils.ProteinNameSplitter as ProteinNameSplitter
-import Utils.FindHeads as FindHeads
 #from Test.Pipeline import log
 import Utils.Stream as Stream
 
+def getTool(moduleName, functionName):
+    """
+    Returns a step function that imports the tool module only when the step is run
+    """
+    def run(**kwargs):
+        __import__(moduleName)
+        return getattr(sys.modules[moduleName], functionName)(**kwargs)
+    run.__name__ = functionName
+    return run
+
 class Preprocessor(ToolChain):
     def __init__(self):
         ToolChain.__init__(self)
@@ -26,12 +26,12 @@ class Preprocessor(ToolChain):
     def getDefaultSteps(self):
         steps = []
         steps.append( ("CONVERT", self.convert, {"dataSetNames":None, "corpusName":None}, "documents.xml") )
-        steps.append( ("SPLIT-SENTENCES", Tools.GeniaSentenceSplitter.makeSentences, {"debug":False, "postProcess":True}, "sentences.xml") )
-        steps.append( ("NER", Tools.BANNER.run, {"elementName":"entity", "processElement":"sentence", "debug":False, "splitNewlines":True}, "ner.xml") )
-        steps.append( ("PARSE", Tools.BLLIPParser.parse, {"parseName":"McCC", "requireEntities":False, "debug":False}, "parse.xml") )
-        steps.append( ("CONVERT-PARSE", Tools.StanfordParser.convertXML, {"parser":"McCC", "debug":False}, "converted-parse.xml") )
-        steps.append( ("SPLIT-NAMES", ProteinNameSplitter.mainFunc, {"parseName":"McCC", "removeOld":True}, "split-names.xml") )
-        steps.append( ("FIND-HEADS", FindHeads.findHeads, {"parse":"McCC", "removeExisting":True}, "heads.xml") )
+        steps.append( ("SPLIT-SENTENCES", getTool("Tools.GeniaSentenceSplitter", "makeSentences"), {"debug":False, "postProcess":True}, "sentences.xml") )
+        steps.append( ("NER", getTool("Tools.BANNER", "run"), {"elementName":"entity", "processElement":"sentence", "debug":False, "splitNewlines":True}, "ner.xml") )
+        steps.append( ("PARSE", getTool("Tools.BLLIPParser", "parse"), {"parseName":"McCC", "requireEntities":False, "debug":False, "processes":1}, "parse.xml") )
+        steps.append( ("CONVERT-PARSE", getTool("Tools.StanfordParser", "convertXML"), {"parser":"McCC", "debug":False, "processes":1}, "converted-parse.xml") )
+        steps.append( ("SPLIT-NAMES", getTool("Utils.ProteinNameSplitter", "mainFunc"), {"parseName":"McCC", "removeOld":True}, "split-names.xml") )
+        steps.append( ("FIND-HEADS", getTool("Utils.FindHeads", "findHeads"), {"parse":"McCC", "removeExisting":True}, "heads.xml") )
         steps.append( ("DIVIDE-SETS", self.divideSets, {"outputStem":None, "saveCombined":True}) )
         return steps
     
@@ -58,6 +58,9 @@ class Preprocessor(ToolChain):
     def convert(self, input, dataSetNames=None, corpusName=None, output=None):
         if isinstance(input, basestring) and (os.path.isdir(input) or input.endswith(".tar.gz") or input.endswith(".txt") or "," in input):
             print >> sys.stderr, "Converting ST-format to Interaction XML"
+            import Utils.STFormat.STTools
+            import Utils.STFormat.Equiv
+            import Utils.STFormat.ConvertXML
             # Get input file (or files)
             dataSetDirs = input
             documents = []
@@ -87,6 +90,7 @@ class Preprocessor(ToolChain):
     def divideSets(self, input, outputStem, saveCombined=True):
         if outputStem != None:
             print >> sys.stderr, "Dividing into sets"
+            import Utils.InteractionXML.DivideSets
             outDir, outputStem = os.path.split(outputStem)
             Utils.InteractionXML.DivideSets.processCorpus(input, outDir, outputStem, ".xml", saveCombined=saveCombined)
         else:
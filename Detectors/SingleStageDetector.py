@@ -7,17 +7,14 @@ import Utils.ElementTreeUtils as ETUtils
 import Utils.Parameters as Parameters
 from Core.Model import Model
 import Core.ExampleUtils as ExampleUtils
-import Utils.STFormat.ConvertXML
-import Utils.STFormat.Compare
 #from Murska.CSCConnection import CSCConnection
 from StepSelector import StepSelector
 #import Utils.Parameters as Parameters
 import types
 from Detector import Detector
+import Utils.Settings as Settings
 
-from ExampleWriters.BioTextExampleWriter import BioTextExampleWriter
 import Evaluators.EvaluateInteractionXML as EvaluateInteractionXML
-import Utils.InteractionXML as InteractionXML
 
 class SingleStageDetector(Detector):
     """
@@ -28,6 +25,20 @@ class SingleStageDetector(Detector):
         Detector.__init__(self)
         self.deleteCombinedExamples = True
         
+    def getExampleSuffix(self, model):
+        """
+        The suffix of the example files, ".bin.gz" if Settings.BINARY_EXAMPLES is set and the
+        classifier defined in the model can read the binary example format, otherwise ".gz".
+        """
+        if Settings.BINARY_EXAMPLES:
+            model = self.openModel(model, "r")
+            parameters = model.getStr(self.tag+"classifier-parameter", defaultIfNotExist=None)
+            if parameters == None:
+                parameters = model.getStr(self.tag+"classifier-parameters-train", defaultIfNotExist=None)
+            if self.getClassifier(parameters).binaryExamples:
+                return ".bin.gz"
+        return ".gz"
+    
     def beginModel(self, step, model, trainExampleFiles, testExampleFile, importIdsFromModel=None):
         """
         Begin the training process leading to a new model.
@@ -55,11 +66,16 @@ class SingleStageDetector(Detector):
                 elif len(trainExampleFiles) == 1: 
                     combinedTrainExamples = trainExampleFiles[0]
                 else:
-                    combinedTrainExamples = self.workDir + os.path.normpath(model.path)+"-"+self.tag+"combined-examples.gz"
+                    binary = ExampleUtils.isBinaryExampleFile(trainExampleFiles[0])
+                    combinedTrainExamples = self.workDir + os.path.normpath(model.path)+"-"+self.tag+"combined-examples" + (".bin.gz" if binary else ".gz")
                     combinedTrainExamplesFile = gzip.open(combinedTrainExamples, 'wb')
-                    for trainExampleFile in trainExampleFiles:
-                        print >> sys.stderr, "Catenating", trainExampleFile, "to", combinedTrainExamples
-                        shutil.copyfileobj(gzip.open(trainExampleFile, 'rb'), combinedTrainExamplesFile)
+                    for i in range(len(trainExampleFiles)):
+                        print >> sys.stderr, "Catenating", trainExampleFiles[i], "to", combinedTrainExamples
+                        trainExampleFile = gzip.open(trainExampleFiles[i], 'rb')
+                        if binary and i > 0: # the combined file has only one header
+                            assert trainExampleFile.read(len(ExampleUtils.BINARY_HEADER)) == ExampleUtils.BINARY_HEADER, trainExampleFiles[i]
+                        shutil.copyfileobj(trainExampleFile, combinedTrainExamplesFile)
+                        trainExampleFile.close()
                     combinedTrainExamplesFile.close()
                 # Upload training model
                 # The parameter grid is stored in the model as "*classifier-parameters-train" so that endModel can 
@@ -87,10 +103,11 @@ class SingleStageDetector(Detector):
                 model.save()
                 # Check for catenated example file
                 if self.deleteCombinedExamples:
-                    combinedTrainExamples = os.path.normpath(model.path)+"-"+self.tag+"combined-examples.gz"
-                    if os.path.exists(combinedTrainExamples):
-                        print >> sys.stderr, "Deleting catenated training example file", combinedTrainExamples
-                        os.remove(combinedTrainExamples)
+                    for suffix in (".gz", ".bin.gz"):
+                        combinedTrainExamples = os.path.normpath(model.path)+"-"+self.tag+"combined-examples"+suffix
+                        if os.path.exists(combinedTrainExamples):
+                            print >> sys.stderr, "Deleting catenated training example file", combinedTrainExamples
+                            os.remove(combinedTrainExamples)
     
     def train(self, trainData=None, optData=None, model=None, combinedModel=None, exampleStyle=None, 
               classifierParameters=None, parse=None, tokenization=None, task=None, fromStep=None, toStep=None,
@@ -108,12 +125,13 @@ class SingleStageDetector(Detector):
             self.structureAnalyzer.analyze([optData, trainData], self.model)
             print >> sys.stderr, self.structureAnalyzer.toString()
         self.model = self.openModel(model, "a") # Devel model already exists, with ids etc
+        suffix = self.getExampleSuffix(self.model)
         if self.checkStep("EXAMPLES"):
-            self.buildExamples(self.model, [optData, trainData], [self.workDir+self.tag+"opt-examples.gz", self.workDir+self.tag+"train-examples.gz"], saveIdsToModel=True)
-        self.beginModel("BEGIN-MODEL", self.model, [self.workDir+self.tag+"train-examples.gz"], self.workDir+self.tag+"opt-examples.gz")
-        self.endModel("END-MODEL", self.model, self.workDir+self.tag+"opt-examples.gz")
-        self.beginModel("BEGIN-COMBINED-MODEL", self.combinedModel, [self.workDir+self.tag+"train-examples.gz", self.workDir+self.tag+"opt-examples.gz"], self.workDir+self.tag+"opt-examples.gz", self.model)
-        self.endModel("END-COMBINED-MODEL", self.combinedModel, self.workDir+self.tag+"opt-examples.gz")
+            self.buildExamples(self.model, [optData, trainData], [self.workDir+self.tag+"opt-examples"+suffix, self.workDir+self.tag+"train-examples"+suffix], saveIdsToModel=True)
+        self.beginModel("BEGIN-MODEL", self.model, [self.workDir+self.tag+"train-examples"+suffix], self.workDir+self.tag+"opt-examples"+suffix)
+        self.endModel("END-MODEL", self.model, self.workDir+self.tag+"opt-examples"+suffix)
+        self.beginModel("BEGIN-COMBINED-MODEL", self.combinedModel, [self.workDir+self.tag+"train-examples"+suffix, self.workDir+self.tag+"opt-examples"+suffix], self.workDir+self.tag+"opt-examples"+suffix, self.model)
+        self.endModel("END-COMBINED-MODEL", self.combinedModel, self.workDir+self.tag+"opt-examples"+suffix)
         if workDir != None:
             self.setWorkDir("")
         self.exitState()
@@ -131,6 +149,7 @@ class SingleStageDetector(Detector):
             model.get(self.tag+"classifier-model", defaultIfNotExist=None), goldData, parse, float(model.getStr("recallAdjustParameter", defaultIfNotExist=1.0)))
         if (validate):
             self.structureAnalyzer.load(model)
+            xml = ETUtils.ETFromObj(xml) # the example writer may return the path to the streamed output
             self.structureAnalyzer.validate(xml)
             ETUtils.write(xml, output+"-pred.xml.gz")
         else:
@@ -138,12 +157,13 @@ class SingleStageDetector(Detector):
         EvaluateInteractionXML.run(self.evaluator, xml, data, parse)
         stParams = self.getBioNLPSharedTaskParams(self.bioNLPSTParams, model)
         if stParams["convert"]: #self.useBioNLPSTFormat:
+            import Utils.STFormat.ConvertXML
             extension = ".zip" if (stParams["convert"] == "zip") else ".tar.gz" 
             Utils.STFormat.ConvertXML.toSTFormat(xml, output+"-events" + extension, outputTag=stParams["a2Tag"], writeExtra=(stParams["scores"] == True))
             if stParams["evaluate"]: #self.stEvaluator != None:
                 if task == None: 
                     task = self.getStr(self.tag+"task", model)
-                self.stEvaluator.evaluate(output+"-events" + extension, task)
+                self.getSTEvaluator().evaluate(output+"-events" + extension, task)
         self.deleteTempWorkDir()
         self.exitState()
         
@@ -157,7 +177,7 @@ class SingleStageDetector(Detector):
         if exampleFileName == None:
             exampleFileName = tag+self.tag+"examples"
             if compressExamples:
-                exampleFileName += ".gz"
+                exampleFileName += self.getExampleSuffix(model)
         if not useExistingExamples:
             self.buildExamples(model, [data], [exampleFileName], [goldData], parse=parse, exampleStyle=exampleStyle)
         if classifierModel == None:
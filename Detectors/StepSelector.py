@@ -1,6 +1,7 @@
-import sys
+import sys, os
 import types
 import time, datetime
+import resource
 
 class StepSelector:
     def __init__(self, steps, fromStep=None, toStep=None, verbose=True, omitSteps=None):
@@ -10,8 +11,13 @@ class StepSelector:
         self.omitSteps = omitSteps
         self.currentStep = None
         self.currentStepStartTime = None
+        self.currentStepStartCPUTimes = None
+        self.currentStepPeakReset = False # whether the peak RSS was reset at the start of the step
         self.setLimits(fromStep, toStep)
         self.verbose = verbose
+        # If profileFile is set, the resource use of each finished step is appended to it
+        self.profileFile = None
+        self.profileName = ""
     
     def markOmitSteps(self, steps):
         if self.omitSteps == None:
@@ -51,6 +57,68 @@ class StepSelector:
     def printStepTime(self):
         if self.currentStep != None and self.currentStepStartTime != None:
             print >> sys.stderr, "===", "EXIT STEP", self.currentStep + ": " + str(datetime.timedelta(seconds=time.time()-self.currentStepStartTime)), "==="
+            self.writeStepProfile()
+    
+    def resetPeakRSS(self):
+        """
+        Reset the peak resident set size of the process so that the peak of a single step
+        can be read at its end. This works only on Linux, elsewhere False is returned.
+        """
+        try:
+            f = open("/proc/self/clear_refs", "wt")
+            f.write("5")
+            f.close()
+            return True
+        except (IOError, OSError):
+            return False
+    
+    def getPeakRSS(self):
+        """
+        The peak resident set size (kB) of the process since the last reset, or None if 
+        it cannot be read.
+        """
+        try:
+            f = open("/proc/self/status", "rt")
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    f.close()
+                    return int(line.split()[1])
+            f.close()
+        except (IOError, OSError):
+            pass
+        return None
+    
+    def writeStepProfile(self):
+        """
+        Append the wall time, CPU time and memory use of the current step to the profile
+        file as a tab-separated line. The CPU time of child processes is counted only for
+        those that have exited. The peak resident set size of the step (kB) is recorded where
+        it can be reset at the start of the step (Linux), otherwise it is "NA". For the exited
+        child processes only the peak of the whole run so far is available.
+        Omitted steps are not recorded.
+        """
+        if self.profileFile == None or self.currentStepStartTime == None:
+            return
+        if self.omitSteps != None and self.currentStep in self.omitSteps:
+            return
+        cpuTimes = os.times()
+        startTimes = self.currentStepStartCPUTimes
+        peakRSS = None
+        if self.currentStepPeakReset:
+            peakRSS = self.getPeakRSS()
+        columns = ["time", "name", "step", "wall", "cpu", "children_cpu", "peak_rss", "children_max_rss_so_far"]
+        values = [time.strftime("%Y-%m-%d %H:%M:%S"), self.profileName, self.currentStep, 
+                  "%.2f" % (time.time() - self.currentStepStartTime),
+                  "%.2f" % max(0.0, cpuTimes[0] + cpuTimes[1] - startTimes[0] - startTimes[1]),
+                  "%.2f" % max(0.0, cpuTimes[2] + cpuTimes[3] - startTimes[2] - startTimes[3]),
+                  str(peakRSS) if peakRSS != None else "NA",
+                  str(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)]
+        writeHeader = not os.path.exists(self.profileFile)
+        f = open(self.profileFile, "at")
+        if writeHeader:
+            f.write("\t".join(columns) + "\n")
+        f.write("\t".join(values) + "\n")
+        f.close()
     
     def getStepStatus(self, step):
         if self.omitSteps != None and step in self.omitSteps:
@@ -97,12 +165,15 @@ class StepSelector:
             if currentIndex < stepIndex:
                 if self.currentStepStartTime != None:
                     if self.verbose: print >> sys.stderr, "===", "EXIT STEP", self.currentStep, "time:", str(datetime.timedelta(seconds=time.time()-self.currentStepStartTime)), "==="
+                    self.writeStepProfile()
                 self.currentStep = step
                 self.currentStepStartTime = time.time()
+                self.currentStepStartCPUTimes = os.times()
                 if self.omitSteps != None and step in self.omitSteps:
                     if self.verbose: print >> sys.stderr, "Omitting step", step
                     return False
                 else:
+                    self.currentStepPeakReset = self.profileFile != None and self.resetPeakRSS()
                     return True
             else:
                 if self.verbose: print >> sys.stderr, "Step", step, "already done, skipping."
@@ -53,7 +53,7 @@ class ToolChain(Detector):
                 parameterName = step[0] + "." + argName
                 if parameters[parameterName] != NOTHING:
                     step[2][argName] = parameters[parameterName]
-            if parameters["intermediateFiles"] != None:
+            if parameters["intermediateFiles"] != None: # with the "intermediateFiles" flag no files are written, and the corpus is passed between the steps only in memory
                 if parameters["intermediateFiles"] != True and step in parameters["intermediateFiles"]:
                     self.setIntermediateFile(step[0], step[3])
                 else:
@@ -98,6 +98,9 @@ class ToolChain(Detector):
         for step in self.steps:
             self.setIntermediateFile(step[0], None)
     
+    def getStepProfilePath(self):
+        return os.path.join(self.outDir, "step-profile.tsv")
+    
     def getIntermediateFilePath(self, step):
         if step[3] != None:
             if self.intermediateFilesAtSource:
@@ -143,7 +146,9 @@ class ToolChain(Detector):
                 if self.getIntermediateFilePath(step) != None: # this step should save an intermediate file
                     stepArgs[step[4]["output"]] = self.getIntermediateFilePath(step)
                 print >> sys.stderr, "Running step", step[0], "with arguments", stepArgs
-                step[1](**stepArgs) # call the tool
+                stepOutput = step[1](**stepArgs) # call the tool
+                if stepOutput != None: # pass the processed corpus to the next step, also when the chain started from an input file
+                    self.xml = stepOutput
             elif self.getStepStatus(step[0]) == "BEFORE": # this step was run earlier
                 savedIntermediate = self.getIntermediateFilePath(step)
         # End state and return
@@ -12,6 +12,9 @@ import Core.ExampleUtils as ExampleUtils
 import itertools
 from collections import defaultdict
 
+def _countDict(): # a module level function keeps the confusion matrix picklable
+    return defaultdict(int)
+
 class AveragingMultiClassEvaluator(Evaluator):
     """
     An evaluator for multiclass classification results, where an example can belong to one
@@ -82,22 +85,22 @@ class AveragingMultiClassEvaluator(Evaluator):
     
     @classmethod
     def threshold(cls, examples, predictions):
+        import numpy
         # Make negative confidence score / true class pairs
         if type(examples) in types.StringTypes:
             examples = ExampleUtils.readExamples(examples, False)
         if type(predictions) in types.StringTypes:
             predictions = ExampleUtils.loadPredictions(predictions)
-        pairs = []
-        realPositives = 0
-        for example, prediction in itertools.izip(examples, predictions):
-            trueClass = example[1]
-            assert(trueClass > 0) # multiclass classification uses non-negative integers
-            if trueClass > 1:
-                realPositives += 1
-            negClassValue = prediction[1]
-            pairs.append( (negClassValue, trueClass) )
-        pairs.sort(reverse=True)
-        realNegatives = len(pairs) - realPositives
+        pairs = [(prediction[1], example[1]) for example, prediction in itertools.izip(examples, predictions)]
+        negClassValues = numpy.array([x[0] for x in pairs], dtype=numpy.float64)
+        trueClasses = numpy.array([x[1] for x in pairs], dtype=numpy.int64)
+        assert (trueClasses > 0).all() # multiclass classification uses non-negative integers
+        # Examples are turned negative in the order of decreasing negative class confidence
+        order = numpy.lexsort((-trueClasses, -negClassValues))
+        negClassValues = negClassValues[order]
+        isNegative = trueClasses[order] == 1
+        realNegatives = int(isNegative.sum())
+        realPositives = len(pairs) - realNegatives
         
         # When starting thresholding, all examples are considered positive
         binaryF = EvaluationData()
@@ -106,20 +109,21 @@ class AveragingMultiClassEvaluator(Evaluator):
         binaryF._fn = 0
         binaryF.calculateFScore()
         fscore = binaryF.fscore
-        threshold = pairs[0][0]-1.
+        threshold = negClassValues[0]-1.
         
-        # Turn one example negative at a time
-        for pair in pairs:
-            if pair[1] == 1: # the real class is negative
-                binaryF._fp -= 1 # false positive -> true negative
-            else: # the real class is a positive class
-                binaryF._tp -= 1 # true positive -> ...
-                binaryF._fn += 1 # ... false negative
-            binaryF.calculateFScore()
-            if binaryF.fscore > fscore:
-                fscore = binaryF.fscore
-                threshold = pair[0]+0.00000001
-        return threshold, fscore        
+        # The f-scores after turning each example negative, calculated as in EvaluationData
+        fn = numpy.cumsum(~isNegative) # true positive -> false negative
+        tp = realPositives - fn
+        fp = realNegatives - numpy.cumsum(isNegative) # false positive -> true negative
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            precision = numpy.where(tp + fp > 0, tp / (tp + fp).astype(numpy.float64), 0.0)
+            recall = numpy.where(tp + fn > 0, tp / (tp + fn).astype(numpy.float64), 0.0)
+            fscores = numpy.where(precision + recall > 0.0, (2*precision*recall) / (precision + recall), 0.0)
+        best = fscores.argmax() # the first of the best thresholds
+        if fscores[best] > fscore:
+            fscore = float(fscores[best])
+            threshold = negClassValues[best]+0.00000001
+        return float(threshold), fscore        
     
 #    def pool(evaluators):
 #        predictions = []
@@ -232,68 +236,57 @@ class AveragingMultiClassEvaluator(Evaluator):
         """
         The actual evaluation
         """
+        import numpy
         #self._calculateUntypedUndirected(examples, predictions)
         # First count instances
-        self.microF = EvaluationData()
-        self.binaryF = EvaluationData()
-        self.matrix = defaultdict(lambda:defaultdict(int))
+        pairs = [(example[1], prediction[0]) for example, prediction in itertools.izip(examples, predictions)]
+        trueClasses = numpy.array([x[0] for x in pairs], dtype=numpy.int64)
+        predictedClasses = numpy.array([x[1] for x in pairs], dtype=numpy.int64)
+        assert (trueClasses > 0).all() # multiclass classification uses non-negative integers
+        assert (predictedClasses > 0).all() # multiclass classification uses non-negative integers
+        # The confusion matrix as an array, with the true class ids as rows
+        size = max([2] + self.classSet.Ids.values() + [trueClasses.max() if len(pairs) > 0 else 0, predictedClasses.max() if len(pairs) > 0 else 0]) + 1
+        counts = numpy.bincount(trueClasses * size + predictedClasses, minlength=size * size).reshape(size, size)
+        self.matrix = defaultdict(_countDict)
         for classId1 in self.classSet.Ids.values():
             for classId2 in self.classSet.Ids.values():
                 self.matrix[classId1][classId2] = 0
-        #self.classifications = []
-        #assert(len(examples) == len(predictions))
-        #for i in range(len(examples)):
-        for example, prediction in itertools.izip(examples, predictions):
-#            self._queueUntypedUndirected(example, prediction)
-            #example = examples[i] # examples and predictions are in matching lists
-            #prediction = predictions[i] # examples and predictions are in matching lists
-            trueClass = example[1]
-            assert(trueClass > 0) # multiclass classification uses non-negative integers
-            predictedClass = prediction[0]
-            #print predictedClass
-            assert(predictedClass > 0) # multiclass classification uses non-negative integers
-            self.matrix[trueClass][predictedClass] += 1
-            if predictedClass == trueClass: # correct classification
-                # correctly classified for its class -> true positive for that class
-                self.dataByClass[trueClass].addTP()
-                if trueClass != 1: # a non-negative example -> correct = true positive
-                    #self.classifications.append("tp")
-                    #self.classifications.append((prediction[0],"tp",self.type,prediction[1],prediction[3]))
-                    self.microF.addTP()
-                    self.binaryF.addTP()
-                else: # a negative example -> correct = true negative
-                    #self.classifications.append((prediction[0],"tn",self.type,prediction[1],prediction[3]))
-                    #self.classifications.append("tn")
-                    self.microF.addTN()
-                    self.binaryF.addTN()
-                for cls in self.classes:
-                    # this example was correctly classified for its class, 
-                    # so it is also correctly classified for each class, 
-                    # i.e. true negative for them
-                    if cls != trueClass:
-                        self.dataByClass[cls].addTN()
-            else: # predictedClass != trueClass:
-                # prediction was incorrect -> false positive for the predicted class
-                self.dataByClass[predictedClass].addFP()
-                if predictedClass == 1: # non-negative example, negative prediction -> incorrect = false negative
-                    #self.classifications.append("fn")
-                    #self.classifications.append((prediction[0],"fn",self.type,prediction[1],prediction[3]))
-                    self.microF.addFN()
-                    self.binaryF.addFN()
-                else: # non-negative incorrect prediction -> false positive
-                    #self.classifications.append("fp")
-                    #self.classifications.append((prediction[0],"fp",self.type,prediction[1],prediction[3]))
-                    self.microF.addFP()
-                    if trueClass == 1:
-                        self.binaryF.addFP()
-                    else:
-                        self.microF.addFN()
-                        self.binaryF.addTP()
-                for cls in self.classes:
-                    if cls == trueClass: # example not found -> false negative
-                        self.dataByClass[cls].addFN()
-                    elif cls != predictedClass:
-                        self.dataByClass[cls].addTN()
+        for trueClass, predictedClass in zip(*counts.nonzero()):
+            self.matrix[int(trueClass)][int(predictedClass)] = int(counts[trueClass, predictedClass])
+        
+        # Per-class counts. An example is a true negative for all classes other than its true and predicted class.
+        diagonal = counts.diagonal()
+        trueCounts = counts.sum(1)
+        predictedCounts = counts.sum(0)
+        for cls in range(size):
+            if (diagonal[cls] > 0 or predictedCounts[cls] > diagonal[cls]) and cls not in self.dataByClass:
+                raise KeyError(cls)
+        for cls in self.classes:
+            tp = int(diagonal[cls])
+            fp = int(predictedCounts[cls] - diagonal[cls])
+            fn = int(trueCounts[cls] - diagonal[cls])
+            self.dataByClass[cls].addTP(tp)
+            self.dataByClass[cls].addFP(fp)
+            self.dataByClass[cls].addFN(fn)
+            self.dataByClass[cls].addTN(len(pairs) - tp - fp - fn)
+        
+        # Averaged counts, with the class 1 as the negative class. For the micro-average an incorrect
+        # positive class is both a false positive and a false negative, for the untyped binary
+        # evaluation it is a true positive.
+        negatives = counts[1, 1]
+        falseNegatives = counts[2:, 1].sum()
+        positives = counts[2:, 2:].sum()
+        correctPositives = diagonal[2:].sum()
+        self.microF = EvaluationData()
+        self.microF.addTP(int(correctPositives))
+        self.microF.addTN(int(negatives))
+        self.microF.addFP(int(counts[1:, 2:].sum() - correctPositives))
+        self.microF.addFN(int(falseNegatives + positives - correctPositives))
+        self.binaryF = EvaluationData()
+        self.binaryF.addTP(int(positives))
+        self.binaryF.addTN(int(negatives))
+        self.binaryF.addFP(int(counts[1, 2:].sum()))
+        self.binaryF.addFN(int(falseNegatives))
         
         # alternative way for calculating the micro-average (the above loop should give the same result)
         # the micro-average is calculated by micro-averaging all classes except 1 (negative). True positives
@@ -66,10 +66,28 @@ def compareEntitiesByGENIARelaxedOffsetMethod(e1, e2, tokens):
     else:
         return False        
 
+# Keys for the comparison functions under which entities match only if
+# their keys are equal
+def getEntityKeySimple(entity):
+    return (entity.get("headOffset"), entity.get("type"))
+
+entityKeyFunctions = {compareEntitiesSimple:getEntityKeySimple}
+
 # Produces a mapping that connects matching entities from prediction (from)
 # to gold standard (to).
 def mapEntities(entitiesFrom, entitiesTo, tokens=None, compareFunction=compareEntitiesSimple):
     entityMap = {}
+    if compareFunction in entityKeyFunctions: # compare only entities with the same key
+        getKey = entityKeyFunctions[compareFunction]
+        entitiesByKey = defaultdict(list)
+        for entityTo in entitiesTo:
+            entitiesByKey[getKey(entityTo)].append(entityTo)
+        for entityFrom in entitiesFrom:
+            entityMap[entityFrom] = []
+            for entityTo in entitiesByKey.get(getKey(entityFrom), []):
+                if compareFunction(entityFrom, entityTo, tokens):
+                    entityMap[entityFrom].append(entityTo)
+        return entityMap
     for entityFrom in entitiesFrom:
         entityMap[entityFrom] = []
         for entityTo in entitiesTo:
@@ -3,7 +3,6 @@ Edge Examples
 """
 
 import sys, os
-from ExampleBuilders.FeatureBuilders.OntoBiotopeFeatureBuilder import OntoBiotopeFeatureBuilder
 thisPath = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.abspath(os.path.join(thisPath,"..")))
 from ExampleBuilders.ExampleBuilder import ExampleBuilder
@@ -11,14 +10,6 @@ from Core.IdSet import IdSet
 import Core.ExampleUtils as ExampleUtils
 from FeatureBuilders.MultiEdgeFeatureBuilder import MultiEdgeFeatureBuilder
 from FeatureBuilders.TokenFeatureBuilder import TokenFeatureBuilder
-from FeatureBuilders.BioInferOntologyFeatureBuilder import BioInferOntologyFeatureBuilder
-from FeatureBuilders.NodalidaFeatureBuilder import NodalidaFeatureBuilder
-from FeatureBuilders.BacteriaRenamingFeatureBuilder import BacteriaRenamingFeatureBuilder
-from FeatureBuilders.RELFeatureBuilder import RELFeatureBuilder
-from FeatureBuilders.DrugFeatureBuilder import DrugFeatureBuilder
-from FeatureBuilders.EVEXFeatureBuilder import EVEXFeatureBuilder
-from FeatureBuilders.GiulianoFeatureBuilder import GiulianoFeatureBuilder
-from FeatureBuilders.OntoBiotopeFeatureBuilder import OntoBiotopeFeatureBuilder
 #import Graph.networkx_v10rc1 as NX10
 from Core.SimpleGraph import Graph
 from FeatureBuilders.TriggerFeatureBuilder import TriggerFeatureBuilder
@@ -79,12 +70,16 @@ class EdgeExampleBuilder(ExampleBuilder):
             self.multiEdgeFeatureBuilder.filterAnnTypes.add("Entity")
         self.tokenFeatureBuilder = TokenFeatureBuilder(self.featureSet)
         if self.styles["ontology"]:
+            from FeatureBuilders.BioInferOntologyFeatureBuilder import BioInferOntologyFeatureBuilder
             self.multiEdgeFeatureBuilder.ontologyFeatureBuilder = BioInferOntologyFeatureBuilder(self.featureSet)
         if self.styles["ontobiotope_features"]:
+            from FeatureBuilders.OntoBiotopeFeatureBuilder import OntoBiotopeFeatureBuilder
             self.ontobiotopeFeatureBuilder = OntoBiotopeFeatureBuilder(self.featureSet)
         if self.styles["nodalida"]:
+            from FeatureBuilders.NodalidaFeatureBuilder import NodalidaFeatureBuilder
             self.nodalidaFeatureBuilder = NodalidaFeatureBuilder(self.featureSet)
         if self.styles["bacteria_renaming"]:
+            from FeatureBuilders.BacteriaRenamingFeatureBuilder import BacteriaRenamingFeatureBuilder
             self.bacteriaRenamingFeatureBuilder = BacteriaRenamingFeatureBuilder(self.featureSet)
         if not self.styles["no_trigger_features"]:
             self.triggerFeatureBuilder = TriggerFeatureBuilder(self.featureSet, self.styles)
@@ -93,12 +88,16 @@ class EdgeExampleBuilder(ExampleBuilder):
                 self.triggerFeatureBuilder.filterAnnTypes.add("Entity")
             #self.bioinferOntologies = OntologyUtils.loadOntologies(OntologyUtils.g_bioInferFileName)
         if self.styles["rel_features"]:
+            from FeatureBuilders.RELFeatureBuilder import RELFeatureBuilder
             self.relFeatureBuilder = RELFeatureBuilder(featureSet)
         if self.styles["drugbank_features"]:
+            from FeatureBuilders.DrugFeatureBuilder import DrugFeatureBuilder
             self.drugFeatureBuilder = DrugFeatureBuilder(featureSet)
         if self.styles["evex"]:
+            from FeatureBuilders.EVEXFeatureBuilder import EVEXFeatureBuilder
             self.evexFeatureBuilder = EVEXFeatureBuilder(featureSet)
         if self.styles["giuliano"]:
+            from FeatureBuilders.GiulianoFeatureBuilder import GiulianoFeatureBuilder
             self.giulianoFeatureBuilder = GiulianoFeatureBuilder(featureSet)
         self.types = types
         if self.styles["random"]:
@@ -207,11 +206,11 @@ class EdgeExampleBuilder(ExampleBuilder):
 #                 break
 #         return categoryName
     
-    def processCorpus(self, input, output, gold=None, append=False, allowNewIds=True, structureAnalyzer=None):
+    def processCorpus(self, input, output, gold=None, append=False, allowNewIds=True, structureAnalyzer=None, workers=None):
         if self.styles["sdb_merge"]:
             structureAnalyzer.determineNonOverlappingTypes()
             self.structureAnalyzer = structureAnalyzer
-        ExampleBuilder.processCorpus(self, input, output, gold, append, allowNewIds, structureAnalyzer)
+        ExampleBuilder.processCorpus(self, input, output, gold, append, allowNewIds, structureAnalyzer, workers)
     
     def isValidInteraction(self, e1, e2, structureAnalyzer,forceUndirected=False):
         return len(structureAnalyzer.getValidEdgeTypes(e1.get("type"), e2.get("type"), forceUndirected=forceUndirected)) > 0
@@ -300,7 +299,7 @@ class EdgeExampleBuilder(ExampleBuilder):
             paths = undirected
             if self.styles["filter_shortest_path"] != None: # For DDI use filter_shortest_path=conj_and
                 paths.resetAnalyses() # just in case
-                paths.FloydWarshall(self.filterEdge, {"edgeTypes":self.styles["filter_shortest_path"]})
+                paths.BreadthFirst(self.filterEdge, {"edgeTypes":self.styles["filter_shortest_path"]})
         
         # Generate examples based on interactions between entities or interactions between tokens
         if self.styles["token_nodes"]:
@@ -11,12 +11,6 @@ import Utils.Libraries.PorterStemmer as PorterStemmer
 from Core.IdSet import IdSet
 import Core.ExampleUtils as ExampleUtils
 #from Core.Gazetteer import Gazetteer
-from FeatureBuilders.RELFeatureBuilder import RELFeatureBuilder
-from FeatureBuilders.WordNetFeatureBuilder import WordNetFeatureBuilder
-from FeatureBuilders.GiulianoFeatureBuilder import GiulianoFeatureBuilder
-from FeatureBuilders.DrugFeatureBuilder import DrugFeatureBuilder
-from FeatureBuilders.OntoBiotopeFeatureBuilder import OntoBiotopeFeatureBuilder
-from FeatureBuilders.WordVectorFeatureBuilder import WordVectorFeatureBuilder
 import PhraseTriggerExampleBuilder
 import Utils.InteractionXML.ResolveEPITriggerTypes
 import Utils.Range as Range
@@ -67,19 +61,25 @@ class EntityExampleBuilder(ExampleBuilder):
             f.close()
         
         if self.styles["rel_features"]:
+            from FeatureBuilders.RELFeatureBuilder import RELFeatureBuilder
             self.relFeatureBuilder = RELFeatureBuilder(featureSet)
         if self.styles["wordnet"]:
+            from FeatureBuilders.WordNetFeatureBuilder import WordNetFeatureBuilder
             self.wordNetFeatureBuilder = WordNetFeatureBuilder(featureSet)
         if self.styles["bb_features"]:
             self.bacteriaTokens = PhraseTriggerExampleBuilder.getBacteriaTokens()
             #self.bacteriaTokens = PhraseTriggerExampleBuilder.getBacteriaTokens(PhraseTriggerExampleBuilder.getBacteriaNames())
         if self.styles["giuliano"]:
+            from FeatureBuilders.GiulianoFeatureBuilder import GiulianoFeatureBuilder
             self.giulianoFeatureBuilder = GiulianoFeatureBuilder(featureSet)
         if self.styles["drugbank_features"]:
+            from FeatureBuilders.DrugFeatureBuilder import DrugFeatureBuilder
             self.drugFeatureBuilder = DrugFeatureBuilder(featureSet)
         if self.styles["ontobiotope_features"]:
+            from FeatureBuilders.OntoBiotopeFeatureBuilder import OntoBiotopeFeatureBuilder
             self.ontobiotopeFeatureBuilder = OntoBiotopeFeatureBuilder(self.featureSet)
         if self.styles["w2v"]:
+            from FeatureBuilders.WordVectorFeatureBuilder import WordVectorFeatureBuilder
             self.wordVectorFeatureBuilder = WordVectorFeatureBuilder(featureSet)
     
     def getMergedEntityType(self, entities):
@@ -7,13 +7,42 @@ from Core.SentenceGraph import getCorpusIterator
 from Core.IdSet import IdSet
 import gzip
 import itertools
+import shutil
+import tempfile
+import cPickle
+from multiprocessing import Process
 from Utils.ProgressCounter import ProgressCounter
 import Utils.Parameters
+import Utils.Settings as Settings
 import Core.ExampleUtils as ExampleUtils
+import Utils.ElementTreeUtils as ETUtils
 import Core.SentenceGraph
 from ExampleBuilders.ExampleStats import ExampleStats
 from Detectors.StructureAnalyzer import StructureAnalyzer
 
+# Id sets loaded without new ids, by file path and modification time. Used only when enabled with cacheIdSets.
+_idSetCache = None
+
+def cacheIdSets(enable=True):
+    """
+    Keep the id sets loaded for classification in memory, so that a long-running process
+    doesn't reload them for every input.
+    """
+    global _idSetCache
+    _idSetCache = {} if enable else None
+
+def loadIdSet(filename, allowNewIds=True):
+    if allowNewIds or _idSetCache == None: # a set that can be extended can't be shared
+        idSet = IdSet(allowNewIds=allowNewIds)
+        idSet.load(filename)
+        return idSet
+    key = (filename, os.path.getmtime(filename))
+    if key not in _idSetCache:
+        idSet = IdSet(allowNewIds=allowNewIds)
+        idSet.load(filename)
+        _idSetCache[key] = idSet
+    return _idSetCache[key]
+
 class ExampleBuilder:
     structureAnalyzer = None
     """ 
@@ -95,7 +124,7 @@ class ExampleBuilder:
         else:
             print >> sys.stderr, "Feature names not saved"
 
-    def processCorpus(self, input, output, gold=None, append=False, allowNewIds=True, structureAnalyzer=None):
+    def processCorpus(self, input, output, gold=None, append=False, allowNewIds=True, structureAnalyzer=None, workers=None):
         # Create intermediate paths if needed
         if os.path.dirname(output) != "" and not os.path.exists(os.path.dirname(output)):
             os.makedirs(os.path.dirname(output))
@@ -104,10 +133,13 @@ class ExampleBuilder:
         if append:
             #print "Appending examples"
             openStyle = "at"
+        writeHeader = ExampleUtils.isBinaryFormat(output) and not (append and os.path.exists(output))
         if output.endswith(".gz"):
             outfile = gzip.open(output, openStyle)
         else:
             outfile = open(output, openStyle)
+        if writeHeader:
+            outfile.write(ExampleUtils.BINARY_HEADER)
         
         # Build examples
         self.exampleCount = 0
@@ -122,13 +154,36 @@ class ExampleBuilder:
             self.elementCounts = None
             self.progress = ProgressCounter(None, "Build examples")
         
-        self.calculatePredictedRange(self.getSentences(input, self.parse, self.tokenization))
+        self.calculatePredictedRange(input)
+        
+        if workers != None and workers > 1 and self.elementCounts != None and self.elementCounts["documents"] > 1:
+            self.progress.markFinished()
+            self.processCorpusInWorkers(input, outfile, gold, workers, structureAnalyzer=structureAnalyzer)
+        else:
+            self.processDocuments(input, outfile, gold, structureAnalyzer=structureAnalyzer)
+        outfile.close()
+        self.progress.endUpdate()
         
+        # Show statistics
+        print >> sys.stderr, "Examples built:", self.exampleCount
+        if self.featureSet.hashSize != None:
+            print >> sys.stderr, "Features: hashed into", self.featureSet.hashSize, "ids"
+        else:
+            print >> sys.stderr, "Features:", len(self.featureSet.getNames())
+        print >> sys.stderr, "Style:", Utils.Parameters.toString(self.getParameters(self.styles))
+        if self.exampleStats.getExampleCount() > 0:
+            self.exampleStats.printStats()
+    
+        # Save Ids
+        if allowNewIds:
+            self.saveIds()
+    
+    def processDocuments(self, input, outfile, gold=None, structureAnalyzer=None, documentRange=None):
         removeIntersentenceInteractions = True
         if "keep_intersentence" in self.styles and self.styles["keep_intersentence"]:
             print >> sys.stderr, "Keeping intersentence interactions for input corpus"
             removeIntersentenceInteractions = False
-        inputIterator = getCorpusIterator(input, None, self.parse, self.tokenization, removeIntersentenceInteractions=removeIntersentenceInteractions)            
+        inputIterator = getCorpusIterator(input, None, self.parse, self.tokenization, removeIntersentenceInteractions=removeIntersentenceInteractions, documentRange=documentRange, cacheDir=Settings.SENTENCE_GRAPH_CACHE)            
         
         #goldIterator = []
         if gold != None:
@@ -136,7 +191,7 @@ class ExampleBuilder:
             if "keep_intersentence_gold" in self.styles and self.styles["keep_intersentence_gold"]:
                 print >> sys.stderr, "Keeping intersentence interactions for gold corpus"
                 removeGoldIntersentenceInteractions = False
-            goldIterator = getCorpusIterator(gold, None, self.parse, self.tokenization, removeIntersentenceInteractions=removeGoldIntersentenceInteractions)
+            goldIterator = getCorpusIterator(gold, None, self.parse, self.tokenization, removeIntersentenceInteractions=removeGoldIntersentenceInteractions, documentRange=documentRange, cacheDir=Settings.SENTENCE_GRAPH_CACHE)
             for inputSentences, goldSentences in itertools.izip_longest(inputIterator, goldIterator, fillvalue=None):
                 assert inputSentences != None
                 assert goldSentences != None
@@ -144,19 +199,98 @@ class ExampleBuilder:
         else:
             for inputSentences in inputIterator:
                 self.processDocument(inputSentences, None, outfile, structureAnalyzer=structureAnalyzer)
+    
+    def processCorpusInWorkers(self, input, outfile, gold, workers, structureAnalyzer=None):
+        """
+        Build the examples in parallel worker processes. Each worker builds the examples for a
+        contiguous range of documents into its own gzipped shard, using its own copies of the
+        class and feature IdSets. The shards are concatenated in document order into the output,
+        with any ids defined by the workers renumbered through the IdSets of this builder.
+        """
+        documentCount = self.elementCounts["documents"]
+        workers = min(workers, documentCount)
+        print >> sys.stderr, "Building examples for", documentCount, "documents in", workers, "worker processes"
+        tempDir = tempfile.mkdtemp()
+        nextFreeIds = (self.classSet.nextFreeId, self.featureSet.nextFreeId)
+        shards = []
+        processes = []
+        for i in range(workers):
+            documentRange = (i * documentCount / workers, (i + 1) * documentCount / workers)
+            if i == workers - 1: # the last worker processes all remaining documents
+                documentRange = (documentRange[0], None)
+            shard = os.path.join(tempDir, "shard" + str(i) + (".bin.gz" if ExampleUtils.isBinaryFormat(outfile.name) else ".gz"))
+            process = Process(target=self._processShard, args=(input, shard, gold, structureAnalyzer, documentRange, i))
+            process.start()
+            shards.append(shard)
+            processes.append(process)
+        for process in processes:
+            process.join()
+        try:
+            for shard, process in zip(shards, processes):
+                assert process.exitcode == 0, ("Example builder worker failed", shard, process.exitcode)
+                f = open(shard + ".stats", "rb")
+                exampleCount, exampleStats = cPickle.load(f)
+                f.close()
+                self.exampleCount += exampleCount
+                self.exampleStats.merge(exampleStats)
+                classMap = self._getIdMap(self.classSet, IdSet(filename=shard + ".class_names"), nextFreeIds[0])
+                featureMap = self._getIdMap(self.featureSet, IdSet(filename=shard + ".feature_names.gz"), nextFreeIds[1])
+                self._appendShard(shard, outfile, classMap, featureMap)
+        finally:
+            shutil.rmtree(tempDir)
+    
+    def _processShard(self, input, shard, gold, structureAnalyzer, documentRange, index):
+        self.exampleCount = 0
+        self.exampleStats = ExampleStats()
+        self.progress = ProgressCounter(None, "Build examples (worker " + str(index) + ")")
+        outfile = gzip.open(shard, "wt")
+        if ExampleUtils.isBinaryFormat(shard):
+            outfile.write(ExampleUtils.BINARY_HEADER)
+        self.processDocuments(input, outfile, gold, structureAnalyzer=structureAnalyzer, documentRange=documentRange)
         outfile.close()
-        self.progress.endUpdate()
-        
-        # Show statistics
-        print >> sys.stderr, "Examples built:", self.exampleCount
-        print >> sys.stderr, "Features:", len(self.featureSet.getNames())
-        print >> sys.stderr, "Style:", Utils.Parameters.toString(self.getParameters(self.styles))
-        if self.exampleStats.getExampleCount() > 0:
-            self.exampleStats.printStats()
+        self.classSet.write(shard + ".class_names")
+        self.featureSet.write(shard + ".feature_names.gz")
+        f = open(shard + ".stats", "wb")
+        cPickle.dump((self.exampleCount, self.exampleStats), f)
+        f.close()
     
-        # Save Ids
-        if allowNewIds:
-            self.saveIds()
+    def _getIdMap(self, idSet, shardIdSet, nextFreeId):
+        """
+        Map the ids defined in a worker (those at or above nextFreeId) to the ids of idSet.
+        The names are added in the order the worker defined them, as in a serial run.
+        """
+        idMap = {}
+        for name, id in sorted(shardIdSet.Ids.iteritems(), key=lambda x: x[1]):
+            if id >= nextFreeId:
+                idMap[id] = idSet.getId(name)
+        return idMap
+    
+    def _appendShard(self, shard, outfile, classMap, featureMap):
+        if ExampleUtils.isBinaryFormat(shard):
+            for example in ExampleUtils.readExamples(shard):
+                example[1] = classMap.get(example[1], example[1])
+                example[2] = dict([(featureMap.get(key, key), value) for key, value in example[2].iteritems()])
+                ExampleUtils.appendExamplesBinary([example], outfile)
+            return
+        f = gzip.open(shard, "rt")
+        for line in f:
+            if len(classMap) == 0 and len(featureMap) == 0:
+                outfile.write(line)
+                continue
+            vector, comment = line.split("#", 1)
+            splits = vector.split()
+            classId = int(splits[0])
+            features = []
+            for item in splits[1:]:
+                featureId, featureValue = item.split(":")
+                featureId = int(featureId)
+                features.append((featureMap.get(featureId, featureId), featureValue))
+            features.sort()
+            outfile.write(str(classMap.get(classId, classId)))
+            for featureId, featureValue in features:
+                outfile.write(" " + str(featureId) + ":" + featureValue)
+            outfile.write(" #" + comment)
+        f.close()
     
     def processDocument(self, sentences, goldSentences, outfile, structureAnalyzer=None):
         #calculatePredictedRange(self, sentences)            
@@ -196,7 +330,7 @@ class ExampleBuilder:
             self.exampleCount += self.buildExamplesFromGraph(sentence.sentenceGraph, outfile, goldGraph, structureAnalyzer=structureAnalyzer)
 
     @classmethod
-    def run(cls, input, output, parse, tokenization, style, classIds=None, featureIds=None, gold=None, append=False, allowNewIds=True, structureAnalyzer=None, debug=False):
+    def run(cls, input, output, parse, tokenization, style, classIds=None, featureIds=None, gold=None, append=False, allowNewIds=True, structureAnalyzer=None, debug=False, workers=None):
         print >> sys.stderr, "Running", cls.__name__
         print >> sys.stderr, "  input:", input
         if gold != None:
@@ -217,7 +351,7 @@ class ExampleBuilder:
         builder.classIdFilename = classIds
         builder.featureIdFilename = featureIds
         builder.parse = parse ; builder.tokenization = tokenization
-        builder.processCorpus(input, output, gold, append=append, allowNewIds=allowNewIds, structureAnalyzer=structureAnalyzer)
+        builder.processCorpus(input, output, gold, append=append, allowNewIds=allowNewIds, structureAnalyzer=structureAnalyzer, workers=workers)
         return builder
 
     def buildExamplesFromGraph(self, sentenceGraph, outfile, goldGraph=None):
@@ -236,16 +370,17 @@ class ExampleBuilder:
         #print featureIds
         if classIds != None and os.path.exists(classIds):
             print >> sys.stderr, "Using predefined class names from", classIds
-            classSet = IdSet(allowNewIds=allowNewIds)
-            classSet.load(classIds)
+            classSet = loadIdSet(classIds, allowNewIds)
         else:
             print >> sys.stderr, "No predefined class names"
             classSet = None
         # Feature ids
         if featureIds != None and os.path.exists(featureIds):
             print >> sys.stderr, "Using predefined feature names from", featureIds
-            featureSet = IdSet(allowNewIds=allowNewIds)
-            featureSet.load(featureIds)
+            featureSet = loadIdSet(featureIds, allowNewIds)
+        elif Settings.FEATURE_HASH_SIZE != None:
+            print >> sys.stderr, "Hashing feature names into", Settings.FEATURE_HASH_SIZE, "ids"
+            featureSet = IdSet(allowNewIds=allowNewIds, hashSize=Settings.FEATURE_HASH_SIZE)
         else:
             print >> sys.stderr, "No predefined feature names"
             featureSet = None
@@ -279,12 +414,30 @@ class ExampleBuilder:
             assert(removeNameInfo == False)
             return input
 
-    def calculatePredictedRange(self, sentences):
+    def iterParsedSentences(self, input, parse, tokenization):
+        """
+        Stream the sentence elements that have tokens and dependencies for the parse,
+        i.e. the sentences for which loadCorpus would build a sentence graph. Documents
+        parsed from a file are cleared once their sentences have been yielded.
+        """
+        from Utils.InteractionXML.SentenceElements import SentenceElements
+        for event, element in ETUtils.ETIteratorFromObj(input, ("start", "end")):
+            if element.tag == "sentence" and event != "start":
+                sentence = SentenceElements(element, parse, tokenization, removeIntersentenceInteractions=False)
+                if len(sentence.tokens) > 0 and len(sentence.dependencies) > 0:
+                    yield element
+            elif event == "end" and element.tag in ("document", "corpus"):
+                element.clear()
+
+    def calculatePredictedRange(self, input):
+        if self.definePredictedValueRange.im_func is ExampleBuilder.definePredictedValueRange.im_func:
+            return # the example builder doesn't use a predicted value range
         print >> sys.stderr, "Defining predicted value range:",
-        sentenceElements = []
-        for sentence in sentences:
-            sentenceElements.append(sentence[0].sentenceElement)
-        self.definePredictedValueRange(sentenceElements, "entity")
+        if type(input) == types.ListType: # a list of sentences
+            sentences = [x[0].sentenceElement for x in input]
+        else:
+            sentences = self.iterParsedSentences(input, self.parse, self.tokenization)
+        self.definePredictedValueRange(sentences, "entity")
         print >> sys.stderr, self.getPredictedValueRange()
 
 def addBasicOptions(optparser):
@@ -299,6 +452,7 @@ def addBasicOptions(optparser):
     optparser.add_option("-a", "--addIds", default=False, action="store_true", dest="addIds", help="Add new features")
     optparser.add_option("-d", "--debug", default=False, action="store_true", dest="debug", help="Debug mode")
     optparser.add_option("--structure", default=None, dest="structure", help="Structure analyzer data file")
+    optparser.add_option("-w", "--workers", default=None, type="int", dest="workers", help="Number of parallel example building processes")
 
 if __name__=="__main__":
     # Import Psyco if available
@@ -331,4 +485,4 @@ if __name__=="__main__":
     #input, output, parse, tokenization, style, classIds=None, featureIds=None, gold=None, append=False)
     ExampleBuilderClass.run(options.input, options.output, options.parse, None, options.parameters, 
                             options.classes, options.features, allowNewIds=options.addIds, 
-                            structureAnalyzer=structureAnalyzer, debug=options.debug, gold=options.gold)
+                            structureAnalyzer=structureAnalyzer, debug=options.debug, gold=options.gold, workers=options.workers)
@@ -1,18 +1,92 @@
-import sys
+import sys, os
+import cPickle
+import numpy
 sys.path.append("..")
 from FeatureBuilder import FeatureBuilder
 from Utils.Libraries.wvlib_light.lwvlib import WV
 import Utils.Settings as Settings
 
+# Word vectors shared by all feature builders in the process
+_wordVectors = {}
+
+class WordVectors():
+    """
+    Normalized word vectors memory-mapped from a cache file. The pages of the
+    cache are shared by all processes that use the same word vectors.
+    """
+    def __init__(self, vectors, words):
+        self.vectors = vectors
+        self.w_to_dim = dict((w,i) for i,w in enumerate(words))
+
+    def w_to_normv(self, word):
+        index = self.w_to_dim.get(word)
+        if index is None:
+            return None
+        return self.vectors[index]
+
+def getWordVectors(filename, maxRankMem=100000, maxRank=10000000):
+    key = (filename, maxRankMem, maxRank)
+    if key not in _wordVectors:
+        _wordVectors[key] = loadWordVectors(filename, maxRankMem, maxRank)
+    return _wordVectors[key]
+
+def loadWordVectors(filename, maxRankMem, maxRank):
+    """
+    Memory-map the normalized vectors cached next to a word2vec binary file. If there
+    is no up-to-date cache, the vectors are loaded with lwvlib and the cache is built.
+    """
+    vectorPath = filename + ".npy"
+    wordPath = filename + ".words"
+    f = open(filename, "rb")
+    wordCount = int(f.readline().split()[0])
+    f.close()
+    if os.path.exists(vectorPath) and os.path.exists(wordPath) and min(os.path.getmtime(vectorPath), os.path.getmtime(wordPath)) >= os.path.getmtime(filename):
+        print >> sys.stderr, "Memory-mapping word vectors from", vectorPath
+        vectors = numpy.load(vectorPath, mmap_mode="r")
+        f = open(wordPath, "rb")
+        words = cPickle.load(f)
+        f.close()
+        if len(words) == min(wordCount, maxRank) and vectors.shape[0] == len(words):
+            return WordVectors(vectors, words)
+        print >> sys.stderr, "Word vector cache doesn't match the requested vectors"
+    print >> sys.stderr, "Loading word vectors from", filename
+    wv = WV.load(filename, maxRankMem, maxRank)
+    try:
+        cacheWordVectors(wv, vectorPath, wordPath)
+    except (IOError, OSError), e:
+        print >> sys.stderr, "Warning, word vectors not cached:", e
+        return wv
+    return WordVectors(numpy.load(vectorPath, mmap_mode="r"), wv.words)
+
+def cacheWordVectors(wv, vectorPath, wordPath):
+    """
+    Write the normalized vectors of a lwvlib WV object as a numpy array file, and
+    its vocabulary as a pickled list. The vectors are normalized as in WV.w_to_normv.
+    """
+    print >> sys.stderr, "Caching normalized word vectors to", vectorPath
+    vectors = numpy.lib.format.open_memmap(vectorPath + "-temp", mode="w+", dtype=wv.vectors.dtype, shape=(len(wv.words), wv.vsize))
+    vectors[:wv.max_rank_mem] = wv.vectors / wv.norm_constants.reshape(-1, 1)
+    for i in range(wv.max_rank_mem, len(wv.words)): # vectors that were not loaded into memory
+        vector = numpy.fromstring(wv.mm_file[wv.offsets[i]:wv.offsets[i]+wv.vsize*4], numpy.float32, wv.vsize).astype(wv.vectors.dtype)
+        vector /= numpy.linalg.norm(x=vector, ord=None)
+        vectors[i] = vector
+    vectors.flush()
+    del vectors
+    f = open(wordPath + "-temp", "wb")
+    cPickle.dump(wv.words, f, cPickle.HIGHEST_PROTOCOL)
+    f.close()
+    os.rename(wordPath + "-temp", wordPath)
+    os.rename(vectorPath + "-temp", vectorPath)
+
 class WordVectorFeatureBuilder(FeatureBuilder):
     def __init__(self, featureSet, style=None):
         FeatureBuilder.__init__(self, featureSet, style)
-        self.model = WV.load(Settings.W2VFILE, 100000, 10000000) #10000, 500000)
-        
+        self.model = getWordVectors(Settings.W2VFILE, 100000, 10000000) #10000, 500000)
+
     def buildFeatures(self, token):
         weights = self.model.w_to_normv(token.get("text").lower())
         if weights is not None:
             for i in range(len(weights)):
                 self.setFeature("W2V_" + str(i), weights[i])
         else:
-            self.setFeature("W2V_None", 1)
\ No newline at end of file
+            self.setFeature("W2V_None", 1)
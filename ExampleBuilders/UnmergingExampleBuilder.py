@@ -14,7 +14,6 @@ from FeatureBuilders.TriggerFeatureBuilder import TriggerFeatureBuilder
 #from FeatureBuilders.TokenFeatureBuilder import TokenFeatureBuilder
 from Core.SimpleGraph import Graph
 from Utils.ProgressCounter import ProgressCounter
-import Utils.Libraries.combine as combine
 import Utils.ElementTreeUtils as ETUtils
 import gzip
 import types
@@ -90,6 +89,7 @@ class UnmergingExampleBuilder(ExampleBuilder):
         defaultParameters["keep_intersentence"] = False
         defaultParameters["keep_intersentence_gold"] = True
         defaultParameters["no_arg_count_upper_limit"] = False
+        defaultParameters["max_arg_combinations"] = None # maximum number of argument combinations per trigger
         self.styles = self._setDefaultParameters(defaultParameters)
         self.styles = self.getParameters(style)
         self.multiEdgeFeatureBuilder = MultiEdgeFeatureBuilder(self.featureSet)
@@ -318,38 +318,17 @@ class UnmergingExampleBuilder(ExampleBuilder):
                     validInteractionsByType[interaction.get("type")].append(interaction)
                 interactionCounts[interaction.get("type")] += 1
             interactionCountString = ",".join([key + "=" + str(interactionCounts[key]) for key in sorted(interactionCounts.keys())])
-            #argCombinations = self.getArgumentCombinations(eType, interactions, entity.get("id"))
-            intCombinations = []
-            validIntTypeCount = 0
-            maxArgCount = 0
+            validIntTypeCount = len(validInteractionsByType)
             if self.debug:
                 print >> sys.stderr, entity.get("id"), entity.get("type"), "int:" + interactionCountString, "validInt:" + str(validInteractionsByType)
-            for intType in sorted(validInteractionsByType.keys()): # for each argument type the event can have
-                validIntTypeCount += 1
-                intCombinations.append([])
-                minArgs, maxArgs = structureAnalyzer.getArgLimits(entity.get("type"), intType)
-                if maxArgs > maxArgCount:
-                    maxArgCount = maxArgs
-                #if maxArgs > 1: # allow any number of arguments for cases like Binding
-                #    maxArgs = len(validInteractionsByType[intType])
-                for combLen in range(minArgs, maxArgs+1): # for each valid argument count, get all possible combinations. note that there may be zero-lenght combination
-                    for singleTypeArgCombination in combinations(validInteractionsByType[intType], combLen):
-                        intCombinations[-1].append(singleTypeArgCombination)
-                # e.g. theme:[a,b], cause:[d] = [[
-            # intCombinations now contains a list of lists, each of which has a tuple for each valid combination
-            # of one argument type. Next, we'll make all valid combinations of multiple argument types
-            if self.debug:
-                print >> sys.stderr, " ", "intCombinations", intCombinations
-            argCombinations = combine.combine(*intCombinations)
-            if self.debug:
-                print >> sys.stderr, " ", "argCombinations", argCombinations
-            for i in range(len(argCombinations)):
-                argCombinations[i] = sum(argCombinations[i], ())
-            #sum(argCombinations, []) # flatten nested list
-            if self.debug:
-                print >> sys.stderr, " ", "argCombinations flat", argCombinations
-            
+            # Combinations that can't be valid events are pruned while they are built, unless any combination is valid
+            argCombinations = self.getArgumentCombinations(entity, validInteractionsByType, structureAnalyzer, prune=not structureAnalyzer.isValidEntity(entity))
+            combinationCount = 0
             for argCombination in argCombinations:
+                if self.styles["max_arg_combinations"] != None and combinationCount >= int(self.styles["max_arg_combinations"]):
+                    self.exampleStats.addValue("Argument combination limit reached", 1)
+                    break
+                combinationCount += 1
                 # Originally binary classification
                 if goldGraph != None:
                     isGoldEvent = self.eventIsGold(entity, argCombination, sentenceGraph, goldGraph, goldEntitiesByOffset, goldGraph.interactions)
@@ -415,6 +394,60 @@ class UnmergingExampleBuilder(ExampleBuilder):
         #return examples
         return exampleIndex
     
+    def getArgumentCombinations(self, entity, validInteractionsByType, structureAnalyzer, prune=True):
+        """
+        Generate the argument combinations of an event. For each argument type in alphabetical order,
+        all combinations of the valid argument count are taken, and these are combined over the
+        argument types. If prune is True, arguments and partial combinations that can't be part of 
+        a valid event (see StructureAnalyzer.isValidEvent) are left out while the combinations are built.
+        """
+        eType = entity.get("type")
+        intTypes = sorted(validInteractionsByType.keys())
+        interactionsByType = []
+        argLimits = []
+        for intType in intTypes: # for each argument type the event can have
+            argLimits.append(structureAnalyzer.getArgLimits(eType, intType))
+            interactionsByType.append(validInteractionsByType[intType])
+        minEventArgs, maxEventArgs = 0, None
+        if prune and eType in structureAnalyzer.events:
+            eventDefinition = structureAnalyzer.events[eType]
+            for argDef in eventDefinition.arguments.values(): # required arguments must be available
+                if argDef.min > 0 and argDef.type not in validInteractionsByType:
+                    return
+            for i in range(len(intTypes)): # remove arguments with an invalid target type
+                targetTypes = eventDefinition.arguments[intTypes[i]].targetTypes
+                interactionsByType[i] = [x for x in interactionsByType[i] if x.get("e2") not in self.documentEntitiesById or self.documentEntitiesById[x.get("e2")].get("type") in targetTypes]
+            minEventArgs = eventDefinition.minArgs
+            if not self.styles["no_arg_count_upper_limit"]:
+                maxEventArgs = eventDefinition.maxArgs
+        # The maximum number of arguments the remaining argument types can add
+        remainingMax = [0] * (len(intTypes) + 1)
+        for i in reversed(range(len(intTypes))):
+            remainingMax[i] = remainingMax[i+1] + min(argLimits[i][1], len(interactionsByType[i]))
+        if remainingMax[0] < minEventArgs:
+            return
+        for argCombination in self._extendArgumentCombination((), 0, interactionsByType, argLimits, remainingMax, minEventArgs, maxEventArgs):
+            yield argCombination
+    
+    def _extendArgumentCombination(self, argCombination, index, interactionsByType, argLimits, remainingMax, minEventArgs, maxEventArgs):
+        """
+        Extend a partial argument combination with the arguments of the types from index onwards. The
+        combinations are generated in the same order as with combine.combine.
+        """
+        if index == len(interactionsByType):
+            yield argCombination
+            return
+        minArgs, maxArgs = argLimits[index]
+        for combLen in range(minArgs, maxArgs+1): # for each valid argument count, get all possible combinations. note that there may be zero-lenght combination
+            argCount = len(argCombination) + combLen
+            if maxEventArgs != None and argCount > maxEventArgs:
+                break
+            if argCount + remainingMax[index+1] < minEventArgs:
+                continue
+            for singleTypeArgCombination in combinations(interactionsByType[index], combLen):
+                for extended in self._extendArgumentCombination(argCombination + singleTypeArgCombination, index + 1, interactionsByType, argLimits, remainingMax, minEventArgs, maxEventArgs):
+                    yield extended
+    
     def buildExample(self, sentenceGraph, paths, eventEntity, argCombination, allInteractions): #themeEntities, causeEntities=None):
         # NOTE!!!! TODO
         # add also features for arguments present, but not in this combination
@@ -4,6 +4,8 @@ Base class for ExampleWriters working with interaction XML.
     
 import sys, os, types
 import itertools
+import shutil
+import tempfile
 thisPath = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.abspath(os.path.join(thisPath,"..")))
 import Core.ExampleUtils as ExampleUtils
@@ -15,6 +17,8 @@ try:
 except ImportError:
     import cElementTree as ET
 import Utils.ElementTreeUtils as ETUtils
+from Utils.InteractionXML.CorpusElements import CorpusElements
+from Utils.InteractionXML.SentenceElements import SentenceElements
 import Utils.InteractionXML.ResolveEPITriggerTypes as ResolveEPITriggerTypes
 from collections import defaultdict
 
@@ -44,11 +48,62 @@ class SentenceExampleWriter:
             examples = ExampleUtils.readExamples(examples, False)
         return examples, predictions
     
+    def iterDocuments(self, corpus, etWriter=None):
+        """
+        Yield the document elements of a corpus file or tree. Each document is written 
+        with the optional ETWriter once the caller has processed it. Documents parsed
+        from a file are cleared after processing.
+        """
+        for event, element in ETUtils.ETIteratorFromObj(corpus, ("start", "end")):
+            if event in ("end", "memory") and element.tag == "document":
+                yield element
+                if etWriter != None:
+                    etWriter.write(element)
+            elif element.tag == "corpus" and etWriter != None:
+                if event == "start":
+                    etWriter.begin(element)
+                else:
+                    etWriter.end(element)
+            if event == "end" and element.tag in ("document", "corpus"):
+                element.clear()
+    
     def writeXML(self, examples, predictions, corpus, outputFile, classSet=None, parse=None, tokenization=None, goldCorpus=None, exampleStyle=None, structureAnalyzer=None):
+        """
+        Insert the predictions into the corpus, one document at a time. The examples must be
+        in the same order as the sentences in the corpus. A corpus file is streamed 
+        into outputFile, and the path to the output is returned. For a corpus tree (or 
+        a corpus file with no outputFile) the tree is modified and returned.
+        """
         #print >> sys.stderr, "Writing output to Interaction XML"
-        corpus = self.loadCorpus(corpus, parse, tokenization)
+        if type(corpus) in types.StringTypes and outputFile != None and os.path.exists(outputFile) and os.path.realpath(corpus) == os.path.realpath(outputFile):
+            # The output would be truncated before the corpus is read, so the corpus is streamed into a temporary file that replaces it
+            fd, tempOutput = tempfile.mkstemp(suffix="-" + os.path.basename(outputFile), dir=os.path.dirname(os.path.abspath(outputFile)))
+            os.close(fd)
+            try:
+                self.writeXML(examples, predictions, corpus, tempOutput, classSet, parse, tokenization, goldCorpus, exampleStyle, structureAnalyzer)
+                shutil.copymode(outputFile, tempOutput)
+            except:
+                os.remove(tempOutput)
+                raise
+            os.rename(tempOutput, outputFile)
+            return outputFile
+        if isinstance(corpus, CorpusElements):
+            corpus = corpus.rootElement
+        corpusTree = None
+        etWriter = None
+        if type(corpus) in types.StringTypes and outputFile != None: # stream the corpus file
+            print >> sys.stderr, "Writing corpus to", outputFile
+            etWriter = ETUtils.ETWriter(outputFile)
+        else: # the corpus is processed in memory
+            corpusTree = ETUtils.ETFromObj(corpus)
+            if ET.iselement(corpusTree):
+                corpusTree = ET.ElementTree(corpusTree)
+            corpus = corpusTree
+        goldDocuments = None
         if goldCorpus != None:
-            goldCorpus = self.loadCorpus(corpus, parse, tokenization)
+            if isinstance(goldCorpus, CorpusElements):
+                goldCorpus = goldCorpus.rootElement
+            goldDocuments = self.iterDocuments(goldCorpus)
         examples, predictions = self.loadExamples(examples, predictions)
         
         if type(classSet) == types.StringType: # class names are in file
@@ -56,72 +111,38 @@ class SentenceExampleWriter:
         classIds = None
         if classSet != None:
             classIds = classSet.getIds()
-            
-        #counter = ProgressCounter(len(corpus.sentences), "Write Examples")
-                
-        exampleQueue = [] # One sentence's examples
-        predictionsByExample = {}
-        currentMajorId = None
-        prevMajorIds = set()
-        processedSentenceIds = set()
-        xType = None
-        
-        count = 0
-        for example in examples:
-            count += 1
-        #assert count > 0
-        if count > 0:
-            progress = ProgressCounter(count, "Write Examples")
-        else:
-            predCount = 0
-            for prediction in predictions:
-                predCount += 1
-            assert predCount == 0
         
-        for example, prediction in itertools.izip_longest(examples, predictions):
-            assert example != None
-            assert prediction != None
-            majorId, minorId = example[0].rsplit(".x", 1)
-            #if currentMajorId == "GENIA.d114.s9": print "Start"
-            if majorId != currentMajorId: # new sentence
-                if currentMajorId != None:
-                    #if currentMajorId == "GENIA.d114.s9": print "JAA"
-                    processedSentenceIds.add(currentMajorId)
-                    sentenceObject = corpus.sentencesById[currentMajorId]
-                    goldSentence = None
-                    if goldCorpus != None:
-                        goldSentence = goldCorpus.sentencesById[currentMajorId]
-                    self.writeXMLSentence(exampleQueue, predictionsByExample, sentenceObject, classSet, classIds, goldSentence=goldSentence, exampleStyle=exampleStyle, structureAnalyzer=structureAnalyzer) # process queue
-                    progress.update(len(exampleQueue), "Writing examples ("+exampleQueue[-1][0]+"): ")
-                exampleQueue = []
+        progress = ProgressCounter(None, "Write Examples")
+        exampleIterator = itertools.izip_longest(examples, predictions)
+        example, prediction = next(exampleIterator, (None, None))
+        for document in self.iterDocuments(corpus, etWriter):
+            goldSentencesById = {}
+            if goldDocuments != None:
+                goldDocument = next(goldDocuments, None)
+                assert goldDocument != None and goldDocument.get("id") == document.get("id"), document.get("id")
+                for goldSentenceElement in goldDocument.findall("sentence"):
+                    goldSentencesById[goldSentenceElement.get("id")] = SentenceElements(goldSentenceElement, parse, tokenization)
+            for sentenceElement in document.findall("sentence"):
+                sentenceId = sentenceElement.get("id")
+                # Collect the sentence's examples from the head of the example stream
+                exampleQueue = [] # One sentence's examples
                 predictionsByExample = {}
-                prevMajorIds.add(currentMajorId)
-                assert majorId not in prevMajorIds, majorId
-                currentMajorId = majorId 
-            exampleQueue.append(example) # queue example
-            predictionsByExample[example[0]] = prediction
-            assert example[3]["xtype"] == self.xType, str(example[3]["xtype"]) + "/" + str(self.xType)
-        
-        # Process what is still in queue
-        if currentMajorId != None:
-            processedSentenceIds.add(currentMajorId)
-            sentenceObject = corpus.sentencesById[currentMajorId]
-            goldSentence = None
-            if goldCorpus != None:
-                goldSentence = goldCorpus.sentencesById[currentMajorId]
-            self.writeXMLSentence(exampleQueue, predictionsByExample, sentenceObject, classSet, classIds, goldSentence=goldSentence, exampleStyle=exampleStyle, structureAnalyzer=structureAnalyzer) # process queue
-            progress.update(len(exampleQueue), "Writing examples ("+exampleQueue[-1][0]+"): ")
-            exampleQueue = []
-            predictionsByExample = {}
-        
-        # Process sentences with no examples (e.g. to clear interactions)
-        for sentenceId in sorted(corpus.sentencesById.keys()):
-            if sentenceId not in processedSentenceIds:
-                sentenceObject = corpus.sentencesById[sentenceId]
-                goldSentence = None
-                if goldCorpus != None:
-                    goldSentence = goldCorpus.sentencesById[currentMajorId]
-                self.writeXMLSentence([], {}, sentenceObject, classSet, classIds, goldSentence=goldSentence, exampleStyle=exampleStyle, structureAnalyzer=structureAnalyzer)
+                while example != None and example[0].rsplit(".x", 1)[0] == sentenceId:
+                    assert prediction != None
+                    assert example[3]["xtype"] == self.xType, str(example[3]["xtype"]) + "/" + str(self.xType)
+                    exampleQueue.append(example) # queue example
+                    predictionsByExample[example[0]] = prediction
+                    example, prediction = next(exampleIterator, (None, None))
+                # Sentences with no examples are also processed (e.g. to clear interactions)
+                sentenceObject = SentenceElements(sentenceElement, parse, tokenization)
+                goldSentence = goldSentencesById.get(sentenceId)
+                self.writeXMLSentence(exampleQueue, predictionsByExample, sentenceObject, classSet, classIds, goldSentence=goldSentence, exampleStyle=exampleStyle, structureAnalyzer=structureAnalyzer) # process queue
+                if len(exampleQueue) > 0:
+                    progress.update(len(exampleQueue), "Writing examples ("+exampleQueue[-1][0]+"): ")
+        if example != None:
+            raise Exception("Example " + example[0] + " does not match a sentence in corpus order")
+        assert prediction == None
+        progress.endUpdate()
         
         # Print statistics
         if len(self.counts) > 0:
@@ -129,10 +150,13 @@ class SentenceExampleWriter:
             self.counts = defaultdict(int)
     
         # Write corpus
+        if etWriter != None:
+            etWriter.close()
+            return outputFile
         if outputFile != None:
             print >> sys.stderr, "Writing corpus to", outputFile
-            ETUtils.write(corpus.rootElement, outputFile)
-        return corpus.tree
+            ETUtils.write(corpusTree.getroot(), outputFile)
+        return corpusTree
 
     def writeXMLSentence(self, examples, predictionsByExample, sentenceObject, classSet, classIds, goldSentence=None, exampleStyle=None, structureAnalyzer=None):
         raise NotImplementedError
@@ -0,0 +1,56 @@
+import sys, os
+import unittest
+import tempfile
+import shutil
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import Utils.ElementTreeUtils as ETUtils
+from ExampleWriters.EntityExampleWriter import EntityExampleWriter
+
+CORPUS = """<corpus source="TEST">
+<document id="d0">
+<sentence id="d0.s0" charOffset="0-16" text="IL-2 binds cells">
+<entity id="d0.s0.e0" charOffset="0-4" headOffset="0-4" type="Protein" given="True" text="IL-2"/>
+<entity id="d0.s0.e1" charOffset="5-10" headOffset="5-10" type="Binding" text="binds"/>
+<analyses><tokenization tokenizer="McCC">
+<token id="d0.s0_1" charOffset="0-4" text="IL-2" POS="NN"/>
+<token id="d0.s0_2" charOffset="5-10" text="binds" POS="VBZ"/>
+<token id="d0.s0_3" charOffset="11-16" text="cells" POS="NNS"/>
+</tokenization><parse parser="McCC" tokenizer="McCC">
+<dependency id="d0.s0.d0" t1="d0.s0_2" t2="d0.s0_1" type="nsubj"/>
+<dependency id="d0.s0.d1" t1="d0.s0_2" t2="d0.s0_3" type="dobj"/>
+</parse></analyses>
+</sentence>
+</document>
+</corpus>
+"""
+
+class SentenceExampleWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.corpus = os.path.join(self.dir, "corpus.xml")
+        f = open(self.corpus, "wt")
+        f.write(CORPUS)
+        f.close()
+    
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+    
+    def write(self, output):
+        return EntityExampleWriter().write([], [], self.corpus, output, parse="McCC", tokenization="McCC")
+    
+    def getEntityIds(self, filename):
+        return [x.get("id") for x in ETUtils.ETFromObj(filename).getroot().iter("entity")]
+    
+    def testWriteToOtherFile(self):
+        output = os.path.join(self.dir, "output.xml")
+        self.assertEqual(self.write(output), output)
+        self.assertEqual(self.getEntityIds(output), ["d0.s0.e0"])
+        self.assertEqual(self.getEntityIds(self.corpus), ["d0.s0.e0", "d0.s0.e1"])
+    
+    def testWriteToCorpusFile(self):
+        self.assertEqual(self.write(self.corpus), self.corpus)
+        self.assertEqual(self.getEntityIds(self.corpus), ["d0.s0.e0"])
+        self.assertEqual(sorted(os.listdir(self.dir)), ["corpus.xml"]) # no temporary files are left
+
+if __name__=="__main__":
+    unittest.main()
@@ -261,7 +261,7 @@ def getSentences(corpusRoot, requireEntities=False, skipIds=[], skipParsed=True)
                 continue
         yield sentence
 
-def parse(input, output=None, tokenizationName=None, parseName="McCC", requireEntities=False, skipIds=[], skipParsed=True, timeout=600, makePhraseElements=True, debug=False, pathParser=None, pathBioModel=None, timestamp=True):
+def parse(input, output=None, tokenizationName=None, parseName="McCC", requireEntities=False, skipIds=[], skipParsed=True, timeout=600, makePhraseElements=True, debug=False, pathParser=None, pathBioModel=None, timestamp=True, processes=1):
     global escDict
     print >> sys.stderr, "BLLIP parser"
     parseTimeStamp = time.strftime("%d.%m.%y %H:%M:%S")
@@ -318,11 +318,11 @@ def parse(input, output=None, tokenizationName=None, parseName="McCC", requireEn
     cwd = os.getcwd()
     os.chdir(pathParser)
     if tokenizationName == None:
-        bllipOutput = runSentenceProcess(runBLLIPParser, pathParser, infileName, workdir, False, "BLLIPParser", "Parsing", timeout=timeout, processArgs={"tokenizer":True, "pathBioModel":pathBioModel})   
+        bllipOutput = runSentenceProcess(runBLLIPParser, pathParser, infileName, workdir, False, "BLLIPParser", "Parsing", timeout=timeout, processes=processes, processArgs={"tokenizer":True, "pathBioModel":pathBioModel})   
     else:
         if tokenizationName == "PARSED_TEXT": # The sentence strings are already tokenized
             tokenizationName = None
-        bllipOutput = runSentenceProcess(runBLLIPParser, pathParser, infileName, workdir, False, "BLLIPParser", "Parsing", timeout=timeout, processArgs={"tokenizer":False, "pathBioModel":pathBioModel})   
+        bllipOutput = runSentenceProcess(runBLLIPParser, pathParser, infileName, workdir, False, "BLLIPParser", "Parsing", timeout=timeout, processes=processes, processArgs={"tokenizer":False, "pathBioModel":pathBioModel})   
 #    args = [charniakJohnsonParserDir + "/parse-50best-McClosky.sh"]
 #    #bioParsingModel = charniakJohnsonParserDir + "/first-stage/DATA-McClosky"
 #    #args = charniakJohnsonParserDir + "/first-stage/PARSE/parseIt -K -l399 -N50 " + bioParsingModel + "/parser | " + charniakJohnsonParserDir + "/second-stage/programs/features/best-parses -l " + bioParsingModel + "/reranker/features.gz " + bioParsingModel + "/reranker/weights.gz"
@@ -452,6 +452,7 @@ if __name__=="__main__":
     optparser.add_option("--timestamp", default=False, action="store_true", dest="timestamp", help="Mark parses with a timestamp.")
     optparser.add_option("--pathParser", default=None, dest="pathParser", help="")
     optparser.add_option("--pathBioModel", default=None, dest="pathBioModel", help="")
+    optparser.add_option("--processes", default=1, type="int", dest="processes", help="Number of parser processes to run in parallel")
     group = OptionGroup(optparser, "Install Options", "")
     group.add_option("--install", default=None, action="store_true", dest="install", help="Install BANNER")
     group.add_option("--installDir", default=None, dest="installDir", help="Install directory")
@@ -463,7 +464,7 @@ if __name__=="__main__":
     if options.install:
         install(options.installDir, options.downloadDir, redownload=options.redownload)
     else:
-        xml = parse(input=options.input, output=options.output, tokenizationName=options.tokenization, pathParser=options.pathParser, pathBioModel=options.pathBioModel, timestamp=options.timestamp)
+        xml = parse(input=options.input, output=options.output, tokenizationName=options.tokenization, pathParser=options.pathParser, pathBioModel=options.pathBioModel, timestamp=options.timestamp, processes=options.processes)
         if options.stanford:
             import StanfordParser
             StanfordParser.convertXML(parser="McClosky", input=xml, output=options.output)
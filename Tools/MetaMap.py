@@ -88,8 +88,7 @@ def process(input, output=None, preprocess=True, debug=False):
         
     if output != None:
         print >> sys.stderr, "Writing output to", output
-        outWriter.close()
-        ETUtils.encodeNewlines(output)
+        outWriter.close() # ETWriter encodes the newlines in attributes
 
     if debug:
         print >> sys.stderr, "Work directory preserved for debugging at", workdir
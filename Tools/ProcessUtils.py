@@ -1,4 +1,6 @@
 import sys, os, codecs, time, signal
+import math
+import threading
 sys.path.append(os.path.dirname(os.path.abspath(__file__))+"/..")
 from Utils.ProgressCounter import ProgressCounter
 
@@ -55,6 +57,11 @@ def waitForProcess(process, numCorpusSentences, measureByGap, outputFile, counte
     counter = ProgressCounter(numCorpusSentences, counterName)
     counter.showMilliseconds = True
     prevNumSentences = 0 # Number of output sentences on previous check
+    numSentences = 0
+    completeSentences = 0 # Number of output sentences in complete lines
+    outputStream = None # The output file is kept open, and only the appended lines are read
+    decoder = codecs.getincrementaldecoder(outputFile[1].get("encoding", "utf-8"))(outputFile[1].get("errors", "strict"))
+    partialLine = ""
     finalCheckLeft = True # Make one final check to update counters
     processStatus = None # When None, process not finished
     prevTime = time.time()
@@ -63,17 +70,24 @@ def waitForProcess(process, numCorpusSentences, measureByGap, outputFile, counte
     while processStatus == None or finalCheckLeft:
         if processStatus != None: # Extra loop to let counters finish
             finalCheckLeft = False # Done only once
-        if os.path.exists(outputFile[0]): # Output file has already appeared on disk
+        if outputStream == None and os.path.exists(outputFile[0]):
+            outputStream = open(outputFile[0], "rb")
+        if outputStream != None: # Output file has already appeared on disk
             # Measure number of sentences in output file
-            numSentences = 0
-            f = codecs.open(outputFile[0], "rt", **outputFile[1])
-            for line in f:
+            outputStream.seek(0, os.SEEK_CUR) # reset the end of file status
+            lines = (partialLine + decoder.decode(outputStream.read())).splitlines(True)
+            partialLine = ""
+            if len(lines) > 0 and (len(lines[-1].splitlines()[0]) == len(lines[-1]) or lines[-1].endswith("\r")): # line not yet complete
+                partialLine = lines.pop()
+            for line in lines:
                 if measureByGap:
                     if line.strip() == "":
-                        numSentences += 1
+                        completeSentences += 1
                 else:
-                    numSentences += 1
-            f.close()
+                    completeSentences += 1
+            numSentences = completeSentences
+            if partialLine != "" and (not measureByGap or partialLine.strip() == ""):
+                numSentences += 1
             # Update status
             if numSentences - prevNumSentences != 0: # Process has progressed
                 counter.update(numSentences - prevNumSentences, updateMessage + ": ")
@@ -94,12 +108,14 @@ def waitForProcess(process, numCorpusSentences, measureByGap, outputFile, counte
             prevTime = time.time() # reset counter if output file hasn't been created
         processStatus = process.poll() # Get process status, None == still running
     
+    if outputStream != None:
+        outputStream.close()
     counter.markFinished() # If we get this far, don't show the error message even if process didn't finish
     return (numSentences, numCorpusSentences)
 
-def makeSubset(input, workdir, fromLine):
+def makeSubset(input, workdir, fromLine, toLine=None):
     """
-    Make a subset of the input data from "fromLine" to end of input file.
+    Make a subset of the input data from "fromLine" to "toLine" (or end of input file).
     """
     newInput = os.path.join(workdir, "input-from-" + str(fromLine))
     newInputFile = codecs.open(newInput, "wt", "utf-8")
@@ -110,6 +126,8 @@ def makeSubset(input, workdir, fromLine):
         lineCount += 1
         if lineCount < fromLine:
             continue
+        if toLine != None and lineCount >= toLine:
+            break
         newInputFile.write(line)  
     inputFile.close()
     newInputFile.close()
@@ -182,14 +200,39 @@ def getLines(filename, measureByGap):
     f.close()
     return numSentences
 
-def runSentenceProcess(launchProcess, programDir, input, workdir, measureByGap, counterName, updateMessage, timeout=None, processArgs={}, outputArgs={}):
+def runSubsetProcess(launchProcess, origInput, workdir, measureByGap, counterName, updateMessage, timeout, processArgs, outputArgs, fromLine, toLine, input=None):
+    """
+    Runs a process on the input sentences from "fromLine" to "toLine", and in case of 
+    problems skips one sentence and reruns the process on the remaining ones. If input
+    is None, a subset file is made for the sentences.
+    """
+    if input == None:
+        input = makeSubset(origInput, workdir, fromLine, toLine)
+    finished = False
+    startLine = fromLine
+    while not finished:
+        output = os.path.join(workdir, "output-from-" + str(startLine))
+        process = launchProcess(input, output, **processArgs)
+        result = waitForProcess(process, toLine - startLine, measureByGap, (output, outputArgs), counterName, updateMessage, timeout)
+        if result[0] != result[1]:
+            gap = 1
+            startLine = getSubsetEndPos(output, measureByGap) + gap 
+            if startLine >= toLine:
+                finished = True
+            else:
+                print >> sys.stderr, "Process failed for sentence " + str(startLine-gap) + ", rerunning from sentence", startLine
+                input = makeSubset(origInput, workdir, startLine, toLine)
+        else:
+            finished = True
+
+def runSentenceProcess(launchProcess, programDir, input, workdir, measureByGap, counterName, updateMessage, timeout=None, processArgs={}, outputArgs={}, processes=1):
     """
     Runs a process on input sentences, and in case of problems skips one sentence and 
-    reruns the process on the remaining ones.
+    reruns the process on the remaining ones. With multiple processes, the input is split
+    into consecutive shards which are processed in parallel.
     """
     # Count input sentences
     input = os.path.abspath(input)
-    origInput = input
     numCorpusSentences = 0
     inputFile = codecs.open(input, "rt", "utf-8")
     for line in inputFile:
@@ -201,29 +244,21 @@ def runSentenceProcess(launchProcess, programDir, input, workdir, measureByGap,
     
     cwd = os.getcwd()
     os.chdir(programDir)
-    finished = False
-    startLine = 0
-    while not finished:
-        # Count lines in input file (input data must be in a one sentence per line -format)
-        inputLines = 0
-        inputFile = codecs.open(input, "rt", "utf-8")
-        for line in inputFile:
-            inputLines += 1
-        inputFile.close()
-
-        output = os.path.join(workdir, "output-from-" + str(startLine))
-        process = launchProcess(input, output, **processArgs)
-        result = waitForProcess(process, inputLines, measureByGap, (output, outputArgs), counterName, updateMessage, timeout)
-        if result[0] != result[1]:
-            gap = 1
-            startLine = getSubsetEndPos(output, measureByGap) + gap 
-            if startLine >= numCorpusSentences:
-                finished = True
-            else:
-                print >> sys.stderr, "Process failed for sentence " + str(startLine-gap) + ", rerunning from sentence", startLine
-                input = makeSubset(origInput, workdir, startLine)
-        else:
-            finished = True
+    if processes != None and processes > 1 and numCorpusSentences > 1:
+        shardSize = int(math.ceil(numCorpusSentences / float(min(processes, numCorpusSentences))))
+        shards = range(0, numCorpusSentences, shardSize)
+        print >> sys.stderr, "Running", len(shards), "processes in parallel"
+        threads = []
+        for i in range(len(shards)):
+            toLine = min(shards[i] + shardSize, numCorpusSentences)
+            thread = threading.Thread(target=runSubsetProcess, args=(launchProcess, input, workdir, measureByGap, 
+                counterName + "-" + str(i), updateMessage, timeout, processArgs, outputArgs, shards[i], toLine))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+    else:
+        runSubsetProcess(launchProcess, input, workdir, measureByGap, counterName, updateMessage, timeout, processArgs, outputArgs, 0, numCorpusSentences, input)
     os.chdir(cwd)
     
     numMissedSentences = mergeOutput(workdir, numCorpusSentences, measureByGap, outputArgs=outputArgs)
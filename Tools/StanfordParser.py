@@ -221,7 +221,7 @@ def addDependencies(outfile, parse, tokenByIndex=None, sentenceId=None, skipExtr
 #    shutil.rmtree(workdir)
 #    return lines
 
-def convertXML(parser, input, output=None, debug=False, reparse=False, stanfordParserDir=None, stanfordParserArgs=None):
+def convertXML(parser, input, output=None, debug=False, reparse=False, stanfordParserDir=None, stanfordParserArgs=None, processes=1):
     #global stanfordParserDir, stanfordParserArgs
     if stanfordParserDir == None:
         stanfordParserDir = Settings.STANFORD_PARSER_DIR
@@ -282,7 +282,7 @@ def convertXML(parser, input, output=None, debug=False, reparse=False, stanfordP
     # Run Stanford parser
     stanfordOutput = runSentenceProcess(runStanford, stanfordParserDir, stanfordInput, 
                                         workdir, True, "StanfordParser", 
-                                        "Stanford Conversion", timeout=600,
+                                        "Stanford Conversion", timeout=600, processes=processes,
                                         outputArgs={"encoding":"latin1", "errors":"replace"},
                                         processArgs={"stanfordParserArgs":stanfordParserArgs})   
     #stanfordOutputFile = codecs.open(stanfordOutput, "rt", "utf-8")
@@ -490,6 +490,7 @@ if __name__=="__main__":
     optparser.add_option("-p", "--parse", default=None, dest="parse", help="Name of parse element.")
     optparser.add_option("--debug", default=False, action="store_true", dest="debug", help="")
     optparser.add_option("--reparse", default=False, action="store_true", dest="reparse", help="")
+    optparser.add_option("--processes", default=1, type="int", dest="processes", help="Number of converter processes to run in parallel")
     group = OptionGroup(optparser, "Install Options", "")
     group.add_option("--install", default=None, action="store_true", dest="install", help="Install BANNER")
     group.add_option("--installDir", default=None, dest="installDir", help="Install directory")
@@ -501,5 +502,5 @@ if __name__=="__main__":
     if options.install:
         install(options.installDir, options.downloadDir, redownload=options.redownload)
     else:
-        convertXML(input=options.input, output=options.output, parser=options.parse, debug=options.debug, reparse=options.reparse)
+        convertXML(input=options.input, output=options.output, parser=options.parse, debug=options.debug, reparse=options.reparse, processes=options.processes)
         
\ No newline at end of file
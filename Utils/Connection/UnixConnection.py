@@ -3,6 +3,7 @@ import subprocess
 import getpass
 import time
 import atexit, signal
+import multiprocessing
 sys.path.append(os.path.normpath(os.path.abspath(os.path.dirname(__file__))+"/../.."))
 from Utils.Timer import Timer
 import Utils.Settings as Settings
@@ -37,6 +38,7 @@ class UnixConnection:
         self.remoteSettingsPath = settings
         self.cachedRemoteSettings = None
         self._logs = {}
+        self._processes = {} # process handles of the local jobs, by job
         if jobLimit == None:
             jobLimit = -1
         self.jobLimit = int(jobLimit)
@@ -310,11 +312,20 @@ class UnixConnection:
     
     def _readJobFile(self, job):
         jobPath = self.getRemotePath(job)
-        if not self.exists(jobPath):
+        if self.account == None: # a local file can be read without starting a process
+            if not os.path.exists(jobPath):
+                if self.debug:
+                    print >> sys.stderr, "Job status file", jobPath, "does not exist"
+                return None
+            f = open(jobPath, "rt")
+            jobLines = f.readlines()
+            f.close()
+        elif not self.exists(jobPath):
             if self.debug:
                 print >> sys.stderr, "Job status file", jobPath, "does not exist"
             return None
-        jobLines = self.run("cat " + jobPath)
+        else:
+            jobLines = self.run("cat " + jobPath)
         if self.debug:
             print >> sys.stderr, "Job status file", jobPath, "=", jobLines
         #localJobFile = open(self.download(job), "rt")
@@ -360,6 +371,8 @@ class UnixConnection:
         # only those programs whose STIME < 'time' are considered.
         jobArgs = {"PID":jobPopen.pid, "time":time.time() + 10}
         job = self._writeJobFile(jobDir, jobName, jobArgs, append=True)
+        if self.account == None: # the process handle tells when a local job has finished
+            self._processes[job] = jobPopen
         # Keep track of log files so they can be closed
         if logFiles != [None, None]:
             assert job not in self._logs
@@ -392,11 +405,16 @@ class UnixConnection:
             
     def getNumJobs(self, includeQueued=True):
         #stdoutLines = self.run("ps -u " + self.getUserName())
-        stdoutLines = self.run("ps -u " + self.getUserName() + " -o ppid")
+        for job in self._processes.keys(): # reap finished local jobs so that they are not counted
+            if self._processes[job].poll() != None:
+                del self._processes[job] # the job file has the return code
+        stdoutLines = self.run("ps -u " + self.getUserName() + " -o ppid,pid")
         groupId = str(os.getpgrp())
+        workerIds = set([str(x.pid) for x in multiprocessing.active_children()]) # worker processes are not jobs
         numProcesses = 0
         for line in stdoutLines:
-            if line.strip() == groupId:
+            splits = line.split()
+            if len(splits) == 2 and splits[0] == groupId and splits[1] not in workerIds:
                 numProcesses += 1
         return numProcesses
     
@@ -426,22 +444,41 @@ class UnixConnection:
     
     def waitForJob(self, job, pollIntervalSeconds=10):
         while self.getJobStatus(job) not in ["FINISHED", "FAILED"]:
-            time.sleep(pollIntervalSeconds)
+            if job in self._processes: # a local job, wait for the process to exit
+                self._processes[job].wait()
+            else:
+                time.sleep(pollIntervalSeconds)
+    
+    def _isJobDone(self, job):
+        """
+        A quick check for a finished local job, using the process handle or the
+        return code in the job file. Remote jobs are only checked by getJobStatus.
+        """
+        if self.account != None:
+            return False
+        if job in self._processes:
+            return self._processes[job].poll() != None
+        jobAttr = self._readJobFile(job)
+        return jobAttr != None and "retcode" in jobAttr
     
     def waitForJobs(self, jobs, pollIntervalSeconds=60, timeout=None, verbose=True):
         print >> sys.stderr, "Waiting for results"
         waitTimer = Timer()
         while(True):
             jobStatus = {"FINISHED":0, "QUEUED":0, "FAILED":0, "RUNNING":0}
+            activeJobs = []
             for job in jobs:
-                jobStatus[self.getJobStatus(job)] += 1
+                status = self.getJobStatus(job)
+                jobStatus[status] += 1
+                if status in ["QUEUED", "RUNNING"]:
+                    activeJobs.append(job)
             jobStatusString = str(jobStatus["QUEUED"]) + " queued, " + str(jobStatus["RUNNING"]) + " running, " + str(jobStatus["FINISHED"]) + " finished, " + str(jobStatus["FAILED"]) + " failed"
             if jobStatus["QUEUED"] + jobStatus["RUNNING"] == 0:
                 if verbose:
                     print >> sys.stderr, "\nAll runs done (" + jobStatusString + ")"
                 break
             # decide what to do
-            if timeout == None or timeoutTimer.getElapsedTime() < timeout:
+            if timeout == None or waitTimer.getElapsedTime() < timeout:
                 sleepTimer = Timer()
                 accountName = self.account
                 if self.account == None:
@@ -454,10 +491,12 @@ class UnixConnection:
                         steps = int(10 * sleepTimer.getElapsedTime() / pollIntervalSeconds) + 1
                         sleepString = " [" + steps * "." + (10-steps) * " " + "]     "
                         print >> sys.stderr, "\rWaiting for " + str(len(jobs)) + " on " + accountName + "(" + jobStatusString + "),", waitTimer.elapsedTimeToString() + sleepString,
-                    time.sleep(5)                
+                    time.sleep(1)
+                    if any(self._isJobDone(x) for x in activeJobs): # update the status as soon as a job ends
+                        break
             else:
                 if verbose:
-                    print >> sys.stderr, "\nTimed out, ", trainTimer.elapsedTimeToString()
+                    print >> sys.stderr, "\nTimed out, ", waitTimer.elapsedTimeToString()
                 break
         return jobStatus
     
@@ -479,6 +518,13 @@ class UnixConnection:
                 self._closeLogs(job)
                 return "FAILED"
         
+        # Check a local job through its process handle
+        if job in self._processes:
+            if self._processes[job].poll() == None:
+                return "RUNNING"
+            del self._processes[job]
+            return self.getJobStatus(job) # the return code has been written by now
+        
         # Check for a running process
         jobAttr["time"] = float(jobAttr["time"])
         currentTime = time.time()
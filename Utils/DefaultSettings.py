@@ -48,6 +48,10 @@ URL["BLLIP_SOURCE"] = "https://github.com/dmcc/bllip-parser/zipball/master"
 URL["STANFORD_PARSER"] = "http://nlp.stanford.edu/software/stanford-parser-2012-03-09.tgz"
 RUBY_PATH = "ruby" # for GENIA Sentence Splitter
 JAVA = "java" # for programs using java
+SCIKIT_PERSISTENT = False # keep scikit-learn models loaded in worker processes between local classify calls
+FEATURE_HASH_SIZE = None # if set, new feature sets hash feature names into this many ids instead of storing them
+SENTENCE_GRAPH_CACHE = None # if set, the sentence graphs built by example builders are cached in this directory
+BINARY_EXAMPLES = False # if set, detectors write their example files in the binary format when the classifier can read it
 
 # Corpora #####################################################################
 
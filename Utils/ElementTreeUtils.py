@@ -11,6 +11,7 @@ __version__ = "$Revision: 1.20 $"
 
 import sys, os
 import codecs
+import re
 
 try:
     import cElementTree as ElementTree
@@ -136,15 +137,40 @@ def escapeText(text):
     import xml.sax.saxutils
     return xml.sax.saxutils.escape(text).replace("'", "&apos;").replace("\"", "&quot;")
 
+newlinePattern = re.compile("(?<!>)[\n\r]")
+
+class NewlineEncoder():
+    """
+    Wraps an output file and encodes newlines as they are written, like encodeNewlines 
+    does for a file that has already been written. Newlines directly after the end of 
+    a tag are kept, other newlines (those inside attributes) are written as "&#10;".
+    """
+    def __init__(self, out):
+        self.out = out
+        self.prevChar = "" # the last character written, for newlines starting a write
+    
+    def write(self, content):
+        if len(content) == 0:
+            return
+        if self.prevChar == ">":
+            content = newlinePattern.sub("&#10;", ">" + content)[1:]
+        else:
+            content = newlinePattern.sub("&#10;", " " + content)[1:]
+        self.prevChar = content[-1]
+        self.out.write(content)
+    
+    def close(self):
+        self.out.close()
+
 class ETWriter():
     def __init__(self, out):
         if isinstance(out,str):
-            if not os.path.exists(os.path.dirname(out)):
+            if os.path.dirname(out) != "" and not os.path.exists(os.path.dirname(out)):
                 os.makedirs(os.path.dirname(out))
             if out.endswith(".gz"):
-                self.out = GzipFile(out,"wt") #codecs.getwriter("utf-8")(GzipFile(out,"wt"))
+                self.out = NewlineEncoder(GzipFile(out,"wt")) #codecs.getwriter("utf-8")(GzipFile(out,"wt"))
             else:
-                self.out = codecs.open(out,"wt") #codecs.open(out, "wt", "utf-8")
+                self.out = NewlineEncoder(codecs.open(out,"wt")) #codecs.open(out, "wt", "utf-8")
         else:
             self.out = out
         print >> self.out, '<?xml version="1.0" encoding="UTF-8"?>'
@@ -237,16 +263,14 @@ def write(rootElement, filename):
     # Create intermediate paths if needed
     if os.path.dirname(filename) != "" and not os.path.exists(os.path.dirname(filename)):
         os.makedirs(os.path.dirname(filename))
-    # Open the output file
+    # Open the output file, newlines inside attributes are fixed while writing
     if filename.endswith(".gz"):
-        out=GzipFile(filename,"wt") #out=codecs.getwriter("utf-8")(GzipFile(filename,"wt"))
+        out=NewlineEncoder(GzipFile(filename,"wt")) #out=codecs.getwriter("utf-8")(GzipFile(filename,"wt"))
     else:
-        out=codecs.open(filename,"wt") #out=codecs.open(filename,"wt","utf-8")
+        out=NewlineEncoder(codecs.open(filename,"wt")) #out=codecs.open(filename,"wt","utf-8")
     print >> out, '<?xml version="1.0" encoding="UTF-8"?>'
     ElementTree.ElementTree(rootElement).write(out,"utf-8")
     out.close()
-    # Fix newlines inside attributes
-    encodeNewlines(filename)
 
 def encodeNewlines(filename):
     import tempfile, shutil
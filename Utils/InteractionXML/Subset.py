@@ -88,8 +88,7 @@ def getSubset(input, output=None, fraction=1.0, seed=0, ids=None, attributes=Non
             if event[1].tag == targetElementTag:
                 skip = False
     if output != None:
-        outWriter.close()
-        ETUtils.encodeNewlines(output)
+        outWriter.close() # ETWriter encodes the newlines in attributes
     
     print >> sys.stderr, "Subset for " + str(input) + ": " + str(counts)
 
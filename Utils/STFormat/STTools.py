@@ -56,25 +56,28 @@ class Document:
             event.connectSites()
 
     def load(self, dir, a2Tags=["a2", "rel"], readExtra=False):
+        """
+        Load the document from a directory, or from a dictionary of file contents by file name
+        """
         if self.debug:
             print >> sys.stderr, "Loading document", self.id
-        a1Path = os.path.join(dir, self.id + ".a1")
-        if os.path.exists(a1Path):
-            self.loadA1(a1Path, readExtra)
+        f = openDocumentFile(dir, self.id + ".a1")
+        if f != None:
+            self.loadA1(f, readExtra)
         if a2Tags == None:
             return proteins, [], [], [], [], []
         for a2Tag in a2Tags:
-            a2Path = os.path.join(dir, self.id + "." + a2Tag)
-            if os.path.exists(a2Path):
-                self.loadA2(a2Path, readExtra)
+            f = openDocumentFile(dir, self.id + "." + a2Tag)
+            if f != None:
+                self.loadA2(f, readExtra)
         self.text = None
-        txtPath = os.path.join(dir, self.id + ".txt")
-        if os.path.exists(txtPath):
-            self.loadText(txtPath)
+        f = openDocumentFile(dir, self.id + ".txt")
+        if f != None:
+            self.loadText(f)
     
     def loadA1(self, filename, readExtraLines=False):
         #f = open(filename)
-        f = codecs.open(filename, "rt", "utf-8")
+        f = openUTF8(filename)
         lines = f.readlines()
         count = 0
         protMap = {}
@@ -131,7 +134,7 @@ class Document:
                     print >> sys.stderr, lines[i].strip()
 
     def loadA2(self, filename, readExtraLines=False):
-        f = codecs.open(filename, "rt", "utf-8")
+        f = openUTF8(filename)
         lines = f.readlines()
         f.close()
         count = 0
@@ -198,7 +201,7 @@ class Document:
         self.connectSites()
     
     def loadText(self, filename):
-        f = codecs.open(filename, "rt", "utf-8")
+        f = openUTF8(filename)
         self.text = f.read()
         f.close()
 
@@ -672,49 +675,103 @@ def readExtra(string, document):
             annotation.extra[key] = value
         prevAnnotation = annotation
 
+def openUTF8(file):
+    """
+    Open a file path, or wrap an open binary file, for reading UTF-8 text
+    """
+    if isinstance(file, basestring):
+        return codecs.open(file, "rt", "utf-8")
+    return codecs.getreader("utf-8")(file)
+
+def openDocumentFile(dir, filename):
+    """
+    Open a file from a directory, or from a dictionary of file contents by file name.
+    Returns None if the file does not exist.
+    """
+    if isinstance(dir, dict):
+        if filename not in dir:
+            return None
+        from cStringIO import StringIO
+        return StringIO(dir[filename])
+    path = os.path.join(dir, filename)
+    if not os.path.exists(path):
+        return None
+    return path
+
+def readArchive(path, extensions):
+    """
+    Read the files with the given extensions (and the LICENSE files) from a tar or zip archive
+    in a single pass, without extracting it to disk.
+    
+    @return: a dictionary of file contents by normalized member path, and the set of all member
+    paths and their parent directories
+    """
+    contents = {}
+    paths = set()
+    def addMember(name, isFile, read):
+        if isinstance(name, unicode):
+            name = name.encode("utf-8")
+        name = os.path.normpath(name)
+        if name == ".":
+            return
+        paths.add(name)
+        parent = os.path.dirname(name)
+        while parent not in ("", "/"):
+            paths.add(parent)
+            parent = os.path.dirname(parent)
+        basename = os.path.basename(name)
+        if isFile and (basename == "LICENSE" or True in [basename.endswith("." + x) for x in extensions]):
+            contents[name] = read()
+    if path.endswith(".zip"):
+        import zipfile
+        with zipfile.ZipFile(path, "r") as f:
+            for info in f.infolist():
+                addMember(info.filename, not info.filename.endswith("/"), lambda: f.read(info))
+    else:
+        import tarfile
+        f = tarfile.open(path, "r|*") # a stream, so the archive is decompressed only once
+        for member in f:
+            addMember(member.name, member.isfile(), lambda: f.extractfile(member).read())
+        f.close()
+    return contents, paths
+
 def loadSet(path, setName=None, level="a2", sitesAreArguments=False, a2Tags=["a2", "rel"], readScores=False, debug=False, subPath=None):
     assert level in ["txt", "a1", "a2"]
     if path.endswith(".tar.gz") or path.endswith(".tgz") or path.endswith(".zip"):
-        import tempfile
-        import zipfile
-        import shutil
-        dir = tempfile.mkdtemp()
-        if path.endswith(".zip"):
-            with zipfile.ZipFile(path, "r") as f:
-                f.extractall(dir)
-        else:
-            import tarfile
-            f = tarfile.open(path, "r")
-            f.extractall(dir)
+        archiveContents, archivePaths = readArchive(path, ["txt", "a1"] + list(a2Tags if a2Tags != None else []))
         # Check if compressed directory is included in the package, like in the ST'11 corpus files
-        compressedFilePath = os.path.join(dir, os.path.basename(path)[:-len(".tar.gz")])
-        if not os.path.exists(compressedFilePath):
-            compressedFilePath = os.path.join(dir, os.path.basename(path)[:-len(".tgz")])
-        if not os.path.exists(compressedFilePath): # at least CO training set has a different dirname inside the tarfile
+        compressedFilePath = os.path.basename(path)[:-len(".tar.gz")]
+        if compressedFilePath not in archivePaths:
+            compressedFilePath = os.path.basename(path)[:-len(".tgz")]
+        if compressedFilePath not in archivePaths: # at least CO training set has a different dirname inside the tarfile
             compressedFilePath = compressedFilePath.rsplit("_", 1)[0]
             print >> sys.stderr, "Package name directory does not exist, trying", compressedFilePath
-        if os.path.exists(compressedFilePath):
+        archiveDir = ""
+        if compressedFilePath in archivePaths:
             print >> sys.stderr, "Reading document set from compressed filename directory", compressedFilePath
-            dir = compressedFilePath
+            archiveDir = compressedFilePath
         if subPath != None:
-            dir = os.path.join(compressedFilePath, subPath)
-        f.close()
+            archiveDir = os.path.normpath(os.path.join(compressedFilePath, subPath))
+        dir = {}
+        for name in archiveContents:
+            if os.path.dirname(name) == archiveDir:
+                dir[os.path.basename(name)] = archiveContents[name]
     elif path.endswith(".txt"):
-        import tempfile
-        import shutil
-        dir = tempfile.mkdtemp()
-        shutil.copy2(path, os.path.join(dir, os.path.basename(path)))
+        f = open(path, "rb")
+        dir = {os.path.basename(path):f.read()}
+        f.close()
     else:
         dir = path
     
     ids = set()
     documents = []
     license = None
-    if os.path.exists(os.path.join(dir, "LICENSE")):
-        licenseFile = open(os.path.join(dir, "LICENSE"), "rt")
+    licenseFile = openDocumentFile(dir, "LICENSE")
+    if licenseFile != None:
+        licenseFile = open(licenseFile, "rt") if isinstance(licenseFile, basestring) else licenseFile
         license = "".join(licenseFile.readlines())
         licenseFile.close()
-    for filename in os.listdir(dir):
+    for filename in (dir.keys() if isinstance(dir, dict) else os.listdir(dir)):
         if filename.endswith(".txt"):
             if filename.startswith("._"): # a hack to skip the broken files in the GRO13 data packages
                 continue
@@ -725,9 +782,6 @@ def loadSet(path, setName=None, level="a2", sitesAreArguments=False, a2Tags=["a2
         doc.dataSet = setName
         doc.license = license
         documents.append(doc)
-    
-    if dir != path:
-        shutil.rmtree(dir)
     return documents
 
 def writeSet(documents, output, resultFileTag="a2", debug=False, writeExtra=False, files=["txt", "a1", "a2", "rel"]):
@@ -7,7 +7,10 @@ Process a large number of input files
 import sys, os
 import time
 import re
+import subprocess
+import multiprocessing
 from Utils.Connection.Connection import getConnection
+from Utils.Connection.UnixConnection import UnixConnection
 
 def getMaxJobsFromFile(controlFilename):
     f = open(controlFilename, "rt")
@@ -23,7 +26,7 @@ def getMaxJobsFromFile(controlFilename):
 def getMaxJobs(maxJobs, controlFilename=None):
     if maxJobs == None:
         if controlFilename != None:
-            return getMaxJobsSetting(controlFilename)
+            return getMaxJobsFromFile(controlFilename)
         else:
             return None
     else:
@@ -43,7 +46,79 @@ def prepareCommand(template, input=None, jobTag=None, output=None):
         template = template.replace("%o", output)
     return template
 
-def submitJob(command, input, connection, jobTag=None, output=None, regex=None, dummy=False, rerun=None, hideFinished=False):
+def runLocalJob(script, jobPath):
+    retcode = subprocess.call(script, shell=True)
+    f = open(jobPath, "rt")
+    hasRetcode = "retcode=" in f.read()
+    f.close()
+    if not hasRetcode: # the command exited the job script
+        f = open(jobPath, "at")
+        f.write("retcode=" + str(retcode) + "\n")
+        f.close()
+    return retcode
+
+class LocalPool():
+    """
+    Runs the jobs of a local connection in a pool of worker processes. The job files
+    are written as by the connection, so that job status checks work the same way.
+    """
+    def __init__(self, connection, processes):
+        assert connection.__class__ == UnixConnection and connection.isLocal(), "A local pool requires a local Unix connection"
+        self.connection = connection
+        self.processes = processes
+        self.setMaxQueued(None)
+        self.pool = multiprocessing.Pool(processes)
+        self.results = []
+    
+    def setMaxQueued(self, maxQueued):
+        """
+        Limit the number of queued or running jobs. By default the limit keeps the workers 
+        busy while the input tree is walked.
+        """
+        if maxQueued == None:
+            self.maxQueued = 2 * self.processes
+        else:
+            self.maxQueued = max(1, maxQueued)
+    
+    def submit(self, command, jobDir, jobName):
+        self.wait(self.maxQueued - 1)
+        script = self.connection.makeJobScript(command, jobDir, jobName)
+        if self.connection.debug:
+            print >> sys.stderr, "------- Job script -------"
+            print >> sys.stderr, script
+            print >> sys.stderr, "--------------------------"
+        # Until the job writes its return code, the status is determined by the batch process
+        jobPath = self.connection.getRemotePath(self.connection.getJob(jobDir, jobName))
+        if not os.path.exists(os.path.dirname(jobPath)):
+            os.makedirs(os.path.dirname(jobPath))
+        f = open(jobPath, "wt")
+        f.write("name=" + jobName + "\nPID=" + str(os.getpid()) + "\ntime=" + str(time.time() + 10) + "\n")
+        f.close()
+        self.results.append(self.pool.apply_async(runLocalJob, (script, jobPath)))
+    
+    def wait(self, maxQueued=0, sleepTime=1):
+        """
+        Wait until at most maxQueued jobs are queued or running.
+        """
+        while True:
+            for result in [x for x in self.results if x.ready()]:
+                result.get() # raise worker errors
+                self.results.remove(result)
+            if len(self.results) <= maxQueued:
+                return
+            self.results[0].wait(sleepTime)
+    
+    def close(self):
+        print >> sys.stderr, "Waiting for", len(self.results), "local jobs"
+        self.wait()
+        self.pool.close()
+        self.pool.join()
+    
+    def terminate(self):
+        self.pool.terminate()
+        self.pool.join()
+
+def submitJob(command, input, connection, jobTag=None, output=None, regex=None, dummy=False, rerun=None, hideFinished=False, pool=None):
     if input != None and input.endswith(".job"):
         if connection.debug:
             print >> sys.stderr, "Skipped job control file", input
@@ -89,7 +164,10 @@ def submitJob(command, input, connection, jobTag=None, output=None, regex=None,
     command = prepareCommand(command, input, jobTag, output)
     
     if not dummy:
-        connection.submit(command, jobDir, jobName)
+        if pool != None:
+            pool.submit(command, jobDir, jobName)
+        else:
+            connection.submit(command, jobDir, jobName)
     else:
         print >> sys.stderr, "Dummy mode"
         if connection.debug:
@@ -98,7 +176,10 @@ def submitJob(command, input, connection, jobTag=None, output=None, regex=None,
             print >> sys.stderr, "--------------------------"
     return True
 
-def waitForJobs(maxJobs, submitCount, connection, controlFilename=None, sleepTime=15):
+def waitForJobs(maxJobs, submitCount, connection, controlFilename=None, sleepTime=15, pool=None):
+    if pool != None: # the pool waits for its own jobs, but the job limit still applies
+        pool.setMaxQueued(getMaxJobs(maxJobs, controlFilename))
+        return
     currentJobs = connection.getNumJobs()
     currentMaxJobs = getMaxJobs(maxJobs, controlFilename)
     print >> sys.stderr, "Current jobs", str(currentJobs) + ", max jobs", str(currentMaxJobs) + ", submitted jobs", submitCount
@@ -119,7 +200,7 @@ def getOutputDir(currentDir, currentItem, input, output=None):
         return os.path.join(output, relativeCurrentDir)
 
 def batch(command, input=None, connection=None, jobTag=None, output=None, regex=None, regexDir=None, dummy=False, rerun=None, 
-          hideFinished=False, controlFilename=None, sleepTime=None, debug=False, limit=None, loop=False):
+          hideFinished=False, controlFilename=None, sleepTime=None, debug=False, limit=None, loop=False, processes=None):
     """
     Process a large number of input files
     
@@ -137,22 +218,41 @@ def batch(command, input=None, connection=None, jobTag=None, output=None, regex=
     @param debug: Job submission scripts are printed on screen.
     @param limit: Maximum number of jobs. Overrides controlFilename
     @param loop: Loop over the input directory. Otherwise process it once.
+    @param processes: Run the jobs locally in a pool of this many worker processes, instead of submitting them through the connection
     """
     if sleepTime == None:
         sleepTime = 15
     connection = getConnection(connection)
     connection.debug = debug
+    pool = None
+    if processes != None and not dummy:
+        print >> sys.stderr, "Running jobs in a local pool of", processes, "processes"
+        pool = LocalPool(connection, processes)
+    try:
+        batchJobs(command, input, connection, jobTag, output, regex, regexDir, dummy, rerun, hideFinished, controlFilename, sleepTime, limit, loop, pool)
+    except SystemExit: # exit requested by the control file, let the submitted jobs finish
+        if pool != None:
+            pool.close()
+        raise
+    except:
+        if pool != None:
+            pool.terminate()
+        raise
+    if pool != None:
+        pool.close()
+
+def batchJobs(command, input, connection, jobTag, output, regex, regexDir, dummy, rerun, hideFinished, controlFilename, sleepTime, limit, loop, pool):
     if input == None: # an inputless batch job:
-        waitForJobs(limit, 0, connection, controlFilename, sleepTime)
-        submitJob(command, input, connection, jobTag, output, regex, dummy, rerun, hideFinished)
+        waitForJobs(limit, 0, connection, controlFilename, sleepTime, pool)
+        submitJob(command, input, connection, jobTag, output, regex, dummy, rerun, hideFinished, pool)
     elif os.path.exists(input) and os.path.isfile(input): # single file
-        waitForJobs(limit, 0, connection, controlFilename, sleepTime)
-        submitJob(command, input, connection, jobTag, output, regex, dummy, rerun, hideFinished)
+        waitForJobs(limit, 0, connection, controlFilename, sleepTime, pool)
+        submitJob(command, input, connection, jobTag, output, regex, dummy, rerun, hideFinished, pool)
     else: # walk directory tree
         firstLoop = True
         submitCount = 0
         while firstLoop or loop:
-            waitForJobs(limit, submitCount, connection, controlFilename, sleepTime)
+            waitForJobs(limit, submitCount, connection, controlFilename, sleepTime, pool)
             for triple in os.walk(input):
                 if regexDir != None and regexDir.match(os.path.join(triple[0])) == None:
                     print >> sys.stderr, "Skipping directory", triple[0]
@@ -161,10 +261,10 @@ def batch(command, input=None, connection=None, jobTag=None, output=None, regex=
                     print >> sys.stderr, "Processing directory", triple[0]
                 for item in sorted(triple[1]) + sorted(triple[2]): # process both directories and files
                     #print item, triple, os.path.join(triple[0], item)
-                    if submitJob(command, os.path.join(triple[0], item), connection, jobTag, getOutputDir(triple[0], item, input, output), regex, dummy, rerun, hideFinished):
+                    if submitJob(command, os.path.join(triple[0], item), connection, jobTag, getOutputDir(triple[0], item, input, output), regex, dummy, rerun, hideFinished, pool):
                         submitCount += 1
                         # number of submitted jobs has increased, so check if we need to wait
-                        waitForJobs(limit, submitCount, connection, controlFilename, sleepTime)
+                        waitForJobs(limit, submitCount, connection, controlFilename, sleepTime, pool)
             firstLoop = False
 
 if __name__=="__main__":
@@ -194,10 +294,12 @@ if __name__=="__main__":
     optparser.add_option("--maxJobs", default=None, type="int", dest="maxJobs", help="Maximum number of jobs in queue/running")
     optparser.add_option("--hideFinished", default=False, action="store_true", dest="hideFinished", help="")
     optparser.add_option("--loop", default=False, action="store_true", dest="loop", help="Continuously loop through the input directory")
+    optparser.add_option("--processes", default=None, type="int", dest="processes", help="Run the jobs in a local pool of this many processes")
     (options, args) = optparser.parse_args()
     
     assert options.command != None
     if options.limit != None: options.limit = int(options.limit)
+    if options.limit == None: options.limit = options.maxJobs
     if options.rerun != None: options.rerun = options.rerun.split(",")
     if options.sleepTime != None: options.sleepTime = int(options.sleepTime)
     if options.regex != None: options.regex = re.compile(options.regex)
@@ -206,4 +308,4 @@ if __name__=="__main__":
           output=options.output, 
           regex=options.regex, regexDir=options.regexDir, dummy=options.dummy, rerun=options.rerun, 
           hideFinished=options.hideFinished, controlFilename=options.controlFile, sleepTime=options.sleepTime, 
-          debug=options.debug, limit=options.limit, loop=options.loop)
+          debug=options.debug, limit=options.limit, loop=options.loop, processes=options.processes)
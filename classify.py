@@ -12,7 +12,6 @@ import Utils.Stream as Stream
 import Utils.Download
 from Utils.Connection.Connection import getConnection
 import Utils.Download
-from Detectors.Preprocessor import Preprocessor
 
 def classify(input, model, output, workDir=None, step=None, omitSteps=None, 
              goldInput=None, detector=None, debug=False, clear=False, 
@@ -51,6 +50,7 @@ def classify(input, model, output, workDir=None, step=None, omitSteps=None,
     
     classifyInput = input
     if selector.check("PREPROCESS"):
+        from Detectors.Preprocessor import Preprocessor
         preprocessor = Preprocessor()
         if debug: 
             preprocessor.setArgForAllSteps("debug", True)
@@ -77,6 +77,108 @@ def classify(input, model, output, workDir=None, step=None, omitSteps=None,
         detector.bioNLPSTParams = detector.getBioNLPSharedTaskParams(bioNLPSTParams, model)
         detector.classify(classifyInput, model, output, goldData=goldInput, fromStep=detectorSteps["CLASSIFY"], omitSteps=omitDetectorSteps["CLASSIFY"], workDir=workDir)
 
+def serve(address, model, detector=None, debug=False, preprocessorTag="-preprocessed.xml.gz",
+          preprocessorParams=None, bioNLPSTParams=None):
+    """
+    Classify inputs sent to a local socket, keeping the model, the detector and the
+    feature and class ids loaded between the inputs.
+
+    Each request is a line with a JSON object with the keys "input" and "output", and
+    optionally "gold", defined as for classify. The reply is a line with a JSON object
+    with the key "output", or "error" if the classification failed. A request with the
+    key "stop" shuts down the server.
+
+    @param address: The path of the Unix domain socket
+    @param model: A path to a model file or the name of a TEES default model.
+    """
+    import socket
+    import json
+    import traceback
+    from Core.Model import Model
+    import ExampleBuilders.ExampleBuilder
+    model = Model(getModel(model), "r") # the model members are extracted only once
+    detectorClass = getDetector(detector, model.path)[0]
+    bioNLPSTParams = detectorClass().getBioNLPSharedTaskParams(bioNLPSTParams, model)
+    ExampleBuilders.ExampleBuilder.cacheIdSets()
+    if os.path.exists(address):
+        os.remove(address)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(address)
+    server.listen(5)
+    print >> sys.stderr, "Classification server listening at", address
+    detector = None
+    try:
+        while True:
+            connection = server.accept()[0]
+            stream = connection.makefile("rw")
+            try:
+                request = json.loads(stream.readline())
+                if request.get("stop"):
+                    stream.write(json.dumps({"output":None}) + "\n")
+                    break
+                if detector == None:
+                    detector = detectorClass()
+                    detector.debug = debug
+                    detector.bioNLPSTParams = bioNLPSTParams
+                output = os.path.abspath(request["output"])
+                Stream.openLog(output + "-log.txt", logCmd=False)
+                try:
+                    classifyInput, preprocess = getInput(request["input"])
+                    if preprocess:
+                        preprocessorOutput = output + preprocessorTag
+                        if os.path.exists(preprocessorOutput):
+                            print >> sys.stderr, "Preprocessor output", preprocessorOutput, "exists, skipping preprocessing."
+                        else:
+                            from Detectors.Preprocessor import Preprocessor
+                            preprocessor = Preprocessor()
+                            if debug:
+                                preprocessor.setArgForAllSteps("debug", True)
+                            preprocessor.process(classifyInput, preprocessorOutput, preprocessorParams, model, [])
+                        classifyInput = preprocessorOutput
+                    goldInput = request.get("gold")
+                    if goldInput != None: goldInput = os.path.abspath(goldInput)
+                    detector.classify(classifyInput, model, output, goldData=goldInput)
+                finally:
+                    Stream.closeLog(output + "-log.txt")
+                stream.write(json.dumps({"output":output}) + "\n")
+            except Exception, e:
+                print >> sys.stderr, traceback.format_exc()
+                if detector != None and detector.workDirIsTempDir:
+                    detector.deleteTempWorkDir()
+                detector = None # a detector left in the middle of a state is not reused
+                stream.write(json.dumps({"error":str(e)}) + "\n")
+            finally:
+                stream.close()
+                connection.close()
+    finally:
+        server.close()
+        os.remove(address)
+        model.close()
+
+def classifyWithServer(address, input, output, goldInput=None):
+    """
+    Classify an input with a server started with serve
+    """
+    import socket
+    import json
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(address)
+    stream = connection.makefile("rw")
+    if input == None: # stop the server
+        request = {"stop":True}
+    else:
+        request = {"input":input if os.path.basename(input).isdigit() else os.path.abspath(input), "output":os.path.abspath(output)}
+        if goldInput != None:
+            request["gold"] = os.path.abspath(goldInput)
+    stream.write(json.dumps(request) + "\n")
+    stream.flush()
+    reply = json.loads(stream.readline())
+    stream.close()
+    connection.close()
+    if "error" in reply:
+        raise Exception("Classification server failed: " + reply["error"])
+    return reply["output"]
+
 def getModel(model):
     if model == None:
         return None
@@ -182,9 +284,24 @@ if __name__=="__main__":
     optparser.add_option("--omitSteps", default=None, dest="omitSteps", help="")
     optparser.add_option("--clearAll", default=False, action="store_true", dest="clearAll", help="Delete all files")
     optparser.add_option("--debug", default=False, action="store_true", dest="debug", help="More verbose output")
+    # Classification server
+    optparser.add_option("--serve", default=None, dest="serve", help="Keep the model loaded and classify inputs sent to this local socket")
+    optparser.add_option("--server", default=None, dest="server", help="Classify the input with a server listening at this local socket")
+    optparser.add_option("--stop", default=False, action="store_true", dest="stop", help="Stop the server defined with --server")
     (options, args) = optparser.parse_args()
     
-    assert options.output != None
-    classify(options.input, options.model, options.output, options.workdir, options.step, options.omitSteps, 
-             options.gold, options.detector, options.debug, options.clearAll,
-             preprocessorParams=options.preprocessorParams, bioNLPSTParams=options.bioNLPSTParams)
+    if options.serve != None:
+        assert options.model != None
+        serve(options.serve, options.model, options.detector, options.debug,
+              preprocessorParams=options.preprocessorParams, bioNLPSTParams=options.bioNLPSTParams)
+    elif options.server != None:
+        if options.stop:
+            classifyWithServer(options.server, None, None)
+        else:
+            assert options.input != None and options.output != None
+            print >> sys.stderr, "Classified", classifyWithServer(options.server, options.input, options.output, options.gold)
+    else:
+        assert options.output != None
+        classify(options.input, options.model, options.output, options.workdir, options.step, options.omitSteps, 
+                 options.gold, options.detector, options.debug, options.clearAll,
+                 preprocessorParams=options.preprocessorParams, bioNLPSTParams=options.bioNLPSTParams)
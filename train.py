@@ -10,7 +10,6 @@ import Utils.Stream as Stream
 import Utils.Settings as Settings
 import Utils.Parameters as Parameters
 from Utils.Connection.Connection import getConnection
-import Utils.STFormat.Compare
 import Utils.InteractionXML.Subset
 import shutil
 import atexit
@@ -18,9 +17,7 @@ import types
 import tempfile
 from Core.Model import Model
 from Detectors.StepSelector import StepSelector
-from Detectors.Preprocessor import Preprocessor
 from Detectors.StructureAnalyzer import StructureAnalyzer
-from Detectors.SingleStageDetector import SingleStageDetector
 
 def train(output, task=None, detector=None, inputFiles=None, models=None, parse=None,
           processUnmerging=None, processModifiers=None, 
@@ -95,6 +92,7 @@ def train(output, task=None, detector=None, inputFiles=None, models=None, parse=
         print >> sys.stderr, "----------------------------------------------------"
         print >> sys.stderr, "------------------ Train Detector ------------------"
         print >> sys.stderr, "----------------------------------------------------"
+        from Detectors.SingleStageDetector import SingleStageDetector
         if isinstance(detector, SingleStageDetector):
             detector.train(inputFiles["train"], inputFiles["devel"], models["devel"], models["test"],
                            exampleStyles["examples"], classifierParams["examples"], parse, None, task,
@@ -112,6 +110,7 @@ def train(output, task=None, detector=None, inputFiles=None, models=None, parse=
                 model = Model(model, "a")
                 model.addStr("detector", detectorName)
                 if preprocessorParams != None:
+                    from Detectors.Preprocessor import Preprocessor
                     preprocessor = Preprocessor()
                     model.addStr("preprocessorParams", Parameters.toString(preprocessor.getParameters(preprocessorParams)))
                 model.save()
@@ -140,6 +139,7 @@ def train(output, task=None, detector=None, inputFiles=None, models=None, parse=
             #detector.bioNLPSTParams["scores"] = False # the evaluation server doesn't like additional files
             detector.classify(inputFiles["test"], models["test"], "classification-test/test", fromStep=detectorSteps["TEST"], workDir="classification-test")
             if detector.bioNLPSTParams["convert"]:
+                import Utils.STFormat.Compare
                 extension = ".zip" if (detector.bioNLPSTParams["convert"] == "zip") else ".tar.gz" 
                 Utils.STFormat.Compare.compare("classification-test/test-events" + extension, "classification-devel/devel-events" + extension, "a2")
 